@@ -1,8 +1,9 @@
 from django.contrib import admin
 
 from inapp.models import LinkedinSearch, LinkedinSearchResult, \
-    LinkedinUser
+    LinkedinUser, LinkedinSearchPage
 
 admin.site.register(LinkedinSearch)
 admin.site.register(LinkedinSearchResult)
 admin.site.register(LinkedinUser)
+admin.site.register(LinkedinSearchPage)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Warm selenium browser sessions reused between parser tasks.
+
+Every celery worker process keeps its own pool. Sessions keep the
+linkedin login, so a leased session skips browser startup and the
+login form when it is still authenticated.
+"""
+import time
+import signal
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from drivers import create_browser
+
+logger = logging.getLogger('linkedin_parser')
+
+
+class BrowserSession(object):
+    """Selenium browser with usage accounting
+    """
+
+    def __init__(self):
+        self.browser = create_browser()
+        self.created = time.time()
+        self.pages_served = 0
+        self.authenticated_user_id = None
+
+    def page_served(self):
+        self.pages_served += 1
+
+    def is_exhausted(self):
+        return self.pages_served >= settings.BROWSER_SESSION_MAX_PAGES
+
+    def is_healthy(self):
+        """Check browser process still answers webdriver commands
+
+        Returns:
+            True if browser is alive, False otherwise
+        """
+        try:
+            self.browser.execute_script('return 1;')
+            self.browser.current_url
+        except Exception as e:
+            logger.error('Browser session health check failed: %s' % e)
+            return False
+
+        return True
+
+    def close(self):
+        try:
+            self.browser.service.process.send_signal(signal.SIGTERM)
+            self.browser.quit()
+        except OSError as e:
+            logger.error(e)
+
+
+class BrowserPool(object):
+    """Pool of idle browser sessions of one worker process
+    """
+
+    def __init__(self, max_idle=None):
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _get_max_idle(self):
+        if self.max_idle is None:
+            return settings.BROWSER_POOL_MAX_IDLE
+        return self.max_idle
+
+    def acquire(self):
+        """
+        Returns:
+            Healthy idle session, new session if pool has no one
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                session = self._idle.pop()
+
+            if session.is_exhausted() or not session.is_healthy():
+                logger.info('Recycle browser session after %d pages'
+                            % session.pages_served)
+                session.close()
+                continue
+
+            logger.info('Reuse warm browser session')
+            return session
+
+        logger.info('Start new browser session')
+        return BrowserSession()
+
+    def release(self, session):
+        """Return session to the pool or close it if it can not be reused
+        """
+        if session.is_exhausted() or not session.is_healthy():
+            session.close()
+            return
+
+        with self._lock:
+            if len(self._idle) < self._get_max_idle():
+                self._idle.append(session)
+                return
+
+        session.close()
+
+    @contextmanager
+    def lease(self):
+        session = self.acquire()
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def close_all(self):
+        with self._lock:
+            sessions, self._idle = self._idle, []
+
+        for session in sessions:
+            session.close()
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Factory of selenium browsers used by parser.
+
+Browser is chosen by LINKEDIN_BROWSER setting, tuning of every browser
+is set in LINKEDIN_BROWSER_OPTIONS:
+
+    window_size: (width, height) of the browser window
+    load_images: False disables loading of images
+    load_fonts: False disables loading of web fonts
+    executable_path: path to browser or its webdriver
+    arguments: extra command line arguments of the browser
+    latency, latency_jitter, total_results, paywall_page, pages_dir,
+    verification_code: pages of 'fake' browser, see inapp/fake_site
+    blocked_hosts: hosts browser never connects to,
+        LINKEDIN_BLOCKED_HOSTS by default
+    blocked_urls: regular expressions of urls browser never requests,
+        LINKEDIN_BLOCKED_URLS by default, only phantomjs supports them
+    proxy: 'host:port' of http proxy all requests are sent through,
+        local ones too. Chrome and firefox block hosts by name
+        resolution, which is done by proxy then, so proxy has to refuse
+        blocked hosts itself
+
+Images, fonts and blocked resources are loaded anyway when
+LINKEDIN_BLOCK_RESOURCES is off.
+"""
+import re
+from selenium import webdriver
+from selenium.webdriver.common.desired_capabilities import \
+    DesiredCapabilities
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+
+from django.conf import settings
+
+BROWSER_PHANTOMJS = 'phantomjs'
+BROWSER_CHROME = 'chrome'
+BROWSER_FIREFOX = 'firefox'
+BROWSER_FAKE = 'fake'
+
+DEFAULT_BROWSER_OPTIONS = {
+    'window_size': (1024, 768),
+    'load_images': True,
+    'load_fonts': True,
+    'executable_path': None,
+    'arguments': [],
+    'blocked_hosts': None,
+    'blocked_urls': None,
+    'proxy': None,
+}
+
+# Phantomjs drops requests before they leave the browser
+PHANTOMJS_BLOCK_URLS_SCRIPT = '''
+    var patterns = arguments[0].map(function(p) { return new RegExp(p); });
+    this.onResourceRequested = function(requestData, request) {
+        for (var i = 0; i < patterns.length; i++) {
+            if (patterns[i].test(requestData.url)) {
+                request.abort();
+                return;
+            }
+        }
+    };
+'''
+
+
+def get_browser_options(name, block_resources=None):
+    """
+    Returns:
+        Options of browser with resource policy applied
+    """
+    if block_resources is None:
+        block_resources = settings.LINKEDIN_BLOCK_RESOURCES
+
+    options = dict(DEFAULT_BROWSER_OPTIONS)
+    options.update(settings.LINKEDIN_BROWSER_OPTIONS.get(name, {}))
+    if options['blocked_hosts'] is None:
+        options['blocked_hosts'] = settings.LINKEDIN_BLOCKED_HOSTS
+    if options['blocked_urls'] is None:
+        options['blocked_urls'] = settings.LINKEDIN_BLOCKED_URLS
+
+    if not block_resources:
+        options.update({
+            'load_images': True, 'load_fonts': True,
+            'blocked_hosts': [], 'blocked_urls': []})
+    return options
+
+
+def _get_blocked_url_patterns(options):
+    """
+    Returns:
+        Regular expressions matching blocked urls and urls on blocked hosts
+    """
+    patterns = list(options['blocked_urls'])
+    for host in options['blocked_hosts']:
+        patterns.append(r'^[a-z]+://([^/]*\.)?%s(:\d+)?/' % re.escape(host))
+    return patterns
+
+
+def _create_phantomjs(options):
+    capabilities = dict(DesiredCapabilities.PHANTOMJS)
+    capabilities['phantomjs.page.settings.loadImages'] = \
+        options['load_images']
+
+    service_args = ['--load-images=%s' % str(options['load_images']).lower()]
+    if options['proxy']:
+        service_args.extend(
+            ['--proxy=%s' % options['proxy'], '--proxy-type=http'])
+    service_args.extend(options['arguments'])
+
+    kwargs = {}
+    if options['executable_path']:
+        kwargs['executable_path'] = options['executable_path']
+    browser = webdriver.PhantomJS(
+        desired_capabilities=capabilities, service_args=service_args,
+        **kwargs)
+
+    patterns = _get_blocked_url_patterns(options)
+    if patterns:
+        # Selenium has no method for phantomjs own command
+        browser.command_executor._commands['executePhantomScript'] = (
+            'POST', '/session/$sessionId/phantom/execute')
+        browser.execute('executePhantomScript', {
+            'script': PHANTOMJS_BLOCK_URLS_SCRIPT, 'args': [patterns]})
+    return browser
+
+
+def _create_chrome(options):
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--window-size=%d,%d' % options['window_size'])
+    if not options['load_images']:
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2})
+    if not options['load_fonts']:
+        chrome_options.add_argument('--disable-remote-fonts')
+    if options['blocked_hosts']:
+        # Blocked hosts resolve to nowhere, requests to them fail at once
+        chrome_options.add_argument('--host-resolver-rules=%s' % ', '.join(
+            'MAP %s 0.0.0.0, MAP *.%s 0.0.0.0' % (host, host)
+            for host in options['blocked_hosts']))
+    if options['proxy']:
+        # Chrome sends requests to localhost past proxy unless told not to
+        chrome_options.add_argument('--proxy-server=%s' % options['proxy'])
+        chrome_options.add_argument('--proxy-bypass-list=<-loopback>')
+    for argument in options['arguments']:
+        chrome_options.add_argument(argument)
+
+    kwargs = {}
+    if options['executable_path']:
+        kwargs['executable_path'] = options['executable_path']
+    return webdriver.Chrome(chrome_options=chrome_options, **kwargs)
+
+
+def _create_firefox(options):
+    profile = webdriver.FirefoxProfile()
+    if not options['load_images']:
+        profile.set_preference('permissions.default.image', 2)
+    if not options['load_fonts']:
+        profile.set_preference('gfx.downloadable_fonts.enabled', False)
+        profile.set_preference('browser.display.use_document_fonts', 0)
+    if options['blocked_hosts']:
+        # Blocked hosts resolve to localhost where nothing listens
+        profile.set_preference(
+            'network.dns.localDomains', ','.join(options['blocked_hosts']))
+    if options['proxy']:
+        host, port = options['proxy'].rsplit(':', 1)
+        profile.set_preference('network.proxy.type', 1)
+        for scheme in ('http', 'ssl'):
+            profile.set_preference('network.proxy.%s' % scheme, host)
+            profile.set_preference(
+                'network.proxy.%s_port' % scheme, int(port))
+        profile.set_preference('network.proxy.no_proxies_on', '')
+        profile.set_preference(
+            'network.proxy.allow_hijacking_localhost', True)
+
+    firefox_options = FirefoxOptions()
+    firefox_options.add_argument('-headless')
+    for argument in options['arguments']:
+        firefox_options.add_argument(argument)
+
+    kwargs = {}
+    if options['executable_path']:
+        kwargs['executable_path'] = options['executable_path']
+    return webdriver.Firefox(
+        firefox_profile=profile, firefox_options=firefox_options, **kwargs)
+
+
+def _create_fake(options):
+    # Fake site needs parser scripts, import it only when it is used
+    from fake_site.browser import FakeBrowser
+    from fake_site.site import FakeSite
+
+    site = FakeSite(
+        total_results=options.get('total_results', 250),
+        paywall_page=options.get('paywall_page'),
+        pages_dir=options.get('pages_dir'),
+        verification_code=options.get('verification_code'))
+    return FakeBrowser(
+        site, latency=options.get('latency', 0),
+        latency_jitter=options.get('latency_jitter', 0))
+
+
+BROWSER_FACTORIES = {
+    BROWSER_PHANTOMJS: _create_phantomjs,
+    BROWSER_CHROME: _create_chrome,
+    BROWSER_FIREFOX: _create_firefox,
+    BROWSER_FAKE: _create_fake,
+}
+
+
+def create_browser(name=None, block_resources=None, proxy=None):
+    """
+    Args:
+        block_resources: apply resource policy,
+            LINKEDIN_BLOCK_RESOURCES setting by default
+        proxy: 'host:port' of http proxy, proxy option of browser
+            by default
+
+    Returns:
+        Started selenium browser chosen by name or LINKEDIN_BROWSER setting
+    """
+    name = name or settings.LINKEDIN_BROWSER
+    try:
+        factory = BROWSER_FACTORIES[name]
+    except KeyError:
+        raise ValueError('Unknown browser: %s' % name)
+
+    options = get_browser_options(name, block_resources)
+    if proxy:
+        options['proxy'] = proxy
+    browser = factory(options)
+    browser.set_window_size(*options['window_size'])
+    return browser
+
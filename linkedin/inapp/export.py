@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""Streaming export of employees of linkedin search.
+
+Rows are read from db by chunks in order of id, every chunk is one
+query that continues after the last id of previous chunk, so memory
+does not depend on count of employees. Exporter of every format turns
+chunks of rows into chunks of file:
+
+    csv, csv.gz, jsonl: written right into response
+    parquet: every chunk of rows is one row group sent as soon as it is
+        written, index of row groups ends the file
+    xlsx: written into temporary file by chunks of rows, the file is
+        sent when it is complete, zip keeps its index at the end of file
+
+Finished searches do not change, their csv and jsonl exports are
+written once into gzipped files of EXPORTS_DIR and served by nginx.
+Files are deleted when results of finished search are rewritten.
+"""
+import os
+import csv
+import time
+import errno
+import shutil
+import gzip
+import json
+import zlib
+import pkgutil
+import tempfile
+from collections import OrderedDict
+
+from django.conf import settings
+
+from models import LinkedinSearchResult
+
+CSV_HEADER = [
+    'ID SEARCH RESULT', 'FIRST NAME', 'LAST NAME', 'TITLE', 'LOCATION',
+    'CURRENT COMPANY']
+
+EMPLOYEE_FIELDS = (
+    'id', 'first_name', 'last_name', 'title', 'location', 'current_company')
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+BUILDING_MARKER = 'building'
+
+
+class Echo(object):
+    """File-like object that returns written value instead of storing it
+    """
+
+    def write(self, value):
+        return value
+
+
+def encode_csv_field(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8').replace(';', '.')
+    return value
+
+
+class CsvRowEncoder(object):
+    """Encode row into line of csv file
+    """
+
+    def __init__(self):
+        self.writer = csv.writer(Echo())
+
+    def encode(self, row):
+        return self.writer.writerow([encode_csv_field(v) for v in row])
+
+
+def iter_employee_chunks(search_id, chunk_size=None):
+    """
+    Yields:
+        Lists of tuples of EMPLOYEE_FIELDS values in order of id
+    """
+    if chunk_size is None:
+        chunk_size = settings.EXPORT_CHUNK_SIZE
+
+    qs = LinkedinSearchResult.objects.filter(
+        search_id=search_id).order_by('id').values_list(*EMPLOYEE_FIELDS)
+    last_id = 0
+    while True:
+        rows = list(qs.filter(id__gt=last_id)[:chunk_size])
+        if rows:
+            yield rows
+
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+def iter_file_chunks(path):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+class Exporter(object):
+    content_type = None
+    extension = None
+    # Format whose gzipped file of finished search serves this format,
+    # None if file is not written
+    stored_format = None
+
+    def is_available(self):
+        """
+        Returns:
+            False if library the format needs is not installed
+        """
+        return True
+
+    def iter_chunks(self, search_id):
+        """
+        Yields:
+            Chunks of export file
+        """
+        raise NotImplementedError('Should be override')
+
+
+class CsvExporter(Exporter):
+    content_type = 'text/csv'
+    extension = 'csv'
+    stored_format = 'csv'
+
+    def iter_chunks(self, search_id):
+        encoder = CsvRowEncoder()
+        yield encoder.encode(CSV_HEADER)
+        for rows in iter_employee_chunks(search_id):
+            yield ''.join(encoder.encode(row) for row in rows)
+
+
+class JsonLinesExporter(Exporter):
+    content_type = 'application/x-ndjson'
+    extension = 'jsonl'
+    stored_format = 'jsonl'
+
+    def encode(self, row):
+        line = json.dumps(
+            OrderedDict(zip(EMPLOYEE_FIELDS, row)), ensure_ascii=False)
+        if isinstance(line, unicode):
+            line = line.encode('utf-8')
+        return line + '\n'
+
+    def iter_chunks(self, search_id):
+        for rows in iter_employee_chunks(search_id):
+            yield ''.join(self.encode(row) for row in rows)
+
+
+class GzipExporter(Exporter):
+    """Gzip output of other exporter on the fly
+    """
+    content_type = 'application/gzip'
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self.extension = exporter.extension + '.gz'
+        self.stored_format = exporter.stored_format
+
+    def iter_chunks(self, search_id):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        for chunk in self.exporter.iter_chunks(search_id):
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+
+class TemporaryFileExporter(Exporter):
+    """Format that can be read only when whole file is written
+    """
+
+    def write_file(self, path, search_id):
+        raise NotImplementedError('Should be override')
+
+    def iter_chunks(self, search_id):
+        fd, path = tempfile.mkstemp(suffix='.' + self.extension)
+        os.close(fd)
+        try:
+            self.write_file(path, search_id)
+            for chunk in iter_file_chunks(path):
+                yield chunk
+        finally:
+            os.remove(path)
+
+
+class XlsxExporter(TemporaryFileExporter):
+    content_type = 'application/vnd.openxmlformats-officedocument.' \
+        'spreadsheetml.sheet'
+    extension = 'xlsx'
+
+    def is_available(self):
+        return pkgutil.find_loader('xlsxwriter') is not None
+
+    def write_file(self, path, search_id):
+        import xlsxwriter
+
+        # Rows are flushed to disk as soon as next row is written. Scraped
+        # text is written as is, text starting with '=' is not a formula
+        workbook = xlsxwriter.Workbook(path, {
+            'constant_memory': True,
+            'strings_to_formulas': False,
+            'strings_to_urls': False})
+        try:
+            worksheet = workbook.add_worksheet('Employees')
+            worksheet.write_row(0, 0, CSV_HEADER)
+            nrow = 1
+            for rows in iter_employee_chunks(search_id):
+                for row in rows:
+                    worksheet.write_row(nrow, 0, row)
+                    nrow += 1
+        finally:
+            workbook.close()
+
+
+class ChunksSink(object):
+    """File-like object that keeps written data until it is taken
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        """
+        Returns:
+            Data written since previous call
+        """
+        data = ''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ParquetExporter(Exporter):
+    content_type = 'application/octet-stream'
+    extension = 'parquet'
+
+    def is_available(self):
+        # Pyarrow loads numpy, it is imported only when file is written
+        return pkgutil.find_loader('pyarrow') is not None
+
+    def iter_chunks(self, search_id):
+        import pyarrow
+        import pyarrow.parquet
+
+        schema = pyarrow.schema(
+            [pyarrow.field('id', pyarrow.int64())] +
+            [pyarrow.field(name, pyarrow.string())
+             for name in EMPLOYEE_FIELDS[1:]])
+
+        # Every chunk of rows is one row group of the file
+        sink = ChunksSink()
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+        try:
+            for rows in iter_employee_chunks(search_id):
+                columns = [
+                    pyarrow.array([row[i] for row in rows], type=field.type)
+                    for i, field in enumerate(schema)]
+                writer.write_table(pyarrow.Table.from_arrays(
+                    columns, schema=schema))
+                yield sink.take()
+        finally:
+            writer.close()
+        yield sink.take()
+
+
+EXPORTERS = {
+    'csv': CsvExporter(),
+    'csv.gz': GzipExporter(CsvExporter()),
+    'jsonl': JsonLinesExporter(),
+    'xlsx': XlsxExporter(),
+    'parquet': ParquetExporter(),
+}
+
+
+def get_exporter(export_format):
+    """
+    Returns:
+        Exporter of format, None if format is unknown or not available
+    """
+    exporter = EXPORTERS.get(export_format)
+    if exporter is None or not exporter.is_available():
+        return None
+    return exporter
+
+
+def get_export_path(search_id, export_format):
+    """
+    Returns:
+        Path of gzipped export file of stored format
+    """
+    return os.path.join(
+        get_export_dir(search_id),
+        'employees.%s.gz' % EXPORTERS[export_format].extension)
+
+
+def get_export_url(search_id, exporter):
+    """
+    Returns:
+        Url of internal nginx location, nginx serves gzipped file of stored
+        format for both plain and gzipped extension
+    """
+    return '%s%d/employees.%s' % (
+        settings.EXPORTS_URL, search_id, exporter.extension)
+
+
+def write_export_files(search_id):
+    """Write gzipped export of every stored format. File is renamed into
+    place when it is complete, so nginx never serves part of it
+    """
+    stored_formats = set(exporter.stored_format
+                         for exporter in EXPORTERS.values())
+    stored_formats.discard(None)
+
+    for export_format in stored_formats:
+        path = get_export_path(search_id, export_format)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        f = gzip.open(tmp_path, 'wb')
+        try:
+            for chunk in EXPORTERS[export_format].iter_chunks(search_id):
+                f.write(chunk)
+        finally:
+            f.close()
+        os.rename(tmp_path, path)
+
+
+def get_export_dir(search_id):
+    return os.path.join(settings.EXPORTS_DIR, '%d' % search_id)
+
+
+def delete_export_files(search_id):
+    # Stale files must not be served, they are written again by next build
+    shutil.rmtree(get_export_dir(search_id), ignore_errors=True)
+
+
+def mark_export_building(search_id):
+    """Marker file is created by one process only, so every build
+    is queued once. Marker of build that did not finish in time
+    is replaced
+
+    Returns:
+        True if build is marked by this call, False if it is marked already
+    """
+    export_dir = get_export_dir(search_id)
+    if not os.path.isdir(export_dir):
+        try:
+            os.makedirs(export_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    path = os.path.join(export_dir, BUILDING_MARKER)
+    try:
+        if time.time() - os.path.getmtime(path) > \
+                settings.EXPORT_BUILD_TIMEOUT:
+            os.remove(path)
+    except OSError:
+        pass
+
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except OSError as e:
+        if e.errno == errno.EEXIST:
+            return False
+        raise
+    os.close(fd)
+    return True
+
+
+def unmark_export_building(search_id):
+    try:
+        os.remove(os.path.join(get_export_dir(search_id), BUILDING_MARKER))
+    except OSError:
+        pass
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Extraction of employees from linkedin people search result pages.
+
+All selectors are compiled once at import time. Every result card
+is walked a single time and turned into a compact row tuple:
+
+    (full_name, title, location, current_company)
+"""
+import re
+from urlparse import urlparse
+
+from lxml import etree, html
+
+ROW_FULL_NAME = 0
+ROW_TITLE = 1
+ROW_LOCATION = 2
+ROW_CURRENT_COMPANY = 3
+
+EMPLOYEE_CARDS = etree.XPath(
+    '//li[contains(@class, "search-result__occluded-item")]')
+PREMIUM_WARNING = etree.XPath(
+    './/div[contains(@class, "search-paywall__warning")]')
+NO_RESULTS_MESSAGE = etree.XPath(
+    '//h1[contains(@class, "search-no-results__message")]')
+ALL_PREMIUM_WARNINGS = etree.XPath(
+    '//div[contains(@class, "search-paywall__warning")]')
+LOGIN_FORM = etree.XPath(
+    '//*[@id="session_key-login"] | //form[contains(@class, "login-form")]')
+# Text selectors return plain strings, smart strings keep reference to
+# their element and so the whole page tree of every stored row
+TOTAL_RESULTS_TEXT = etree.XPath(
+    '//h3[contains(@class, "search-results__total")]//text()',
+    smart_strings=False)
+FIRST_TEXT = etree.XPath('text()', smart_strings=False)
+ALL_TEXT = etree.XPath('.//text()', smart_strings=False)
+
+FULL_NAME_CLASS = 'actor-name'
+TITLE_CLASS = 'subline-level-1'
+LOCATION_CLASS = 'subline-level-2'
+CURRENT_COMPANY_CLASS = 'search-result__snippets'
+
+# "About 1,234 results", "Showing 12 results", "About 1.2K results",
+# thousands are separated by no-break and thin spaces too
+TOTAL_RESULTS_RE = re.compile(
+    ur'(\d[\d,.\s\u00a0\u2009\u202f]*?)\s*([KM])?\s+results?',
+    re.IGNORECASE | re.UNICODE)
+TOTAL_RESULTS_MULTIPLIERS = {'K': 1000, 'M': 1000000}
+
+
+def _first_text(element):
+    texts = FIRST_TEXT(element)
+    if texts:
+        return texts[0]
+    return None
+
+
+def extract_card(card):
+    """Walk all descendants of a result card once and pick up its fields
+
+    Returns:
+        Row tuple, full name is None if card has no employee name
+    """
+    full_name = title = location = None
+    company_texts = []
+
+    for element in card.iter('span', 'p'):
+        css_class = element.get('class')
+        if not css_class:
+            continue
+
+        if element.tag == 'span':
+            if full_name is None and FULL_NAME_CLASS in css_class:
+                full_name = _first_text(element)
+        elif title is None and TITLE_CLASS in css_class:
+            title = _first_text(element)
+        elif location is None and LOCATION_CLASS in css_class:
+            location = _first_text(element)
+        elif CURRENT_COMPANY_CLASS in css_class:
+            company_texts.extend(ALL_TEXT(element))
+
+    if location is not None:
+        location = location.strip()
+    current_company = ' '.join(company_texts).replace('Current:', '').strip()
+
+    return (full_name, title, location, current_company)
+
+
+def get_employee_cards(page_html):
+    return EMPLOYEE_CARDS(page_html)
+
+
+def has_premium_warning(cards):
+    """Linkedin shows premium warning in the first card of the list
+
+    Returns:
+        True if premium block exists, False otherwise
+    """
+    if cards and PREMIUM_WARNING(cards[0]):
+        return True
+    return False
+
+
+def extract_rows(cards, premium_exists=False):
+    """
+    Returns:
+        List of row tuples for every card with employee name
+    """
+    rows = []
+    for i, card in enumerate(cards):
+        if premium_exists and i == 0:
+            continue
+
+        row = extract_card(card)
+        if row[ROW_FULL_NAME]:
+            rows.append(row)
+
+    return rows
+
+
+def extract_total_results(page_html):
+    """Parse results header of employees page
+
+    Returns:
+        Total count of results, None if header is not found
+    """
+    header = ' '.join(TOTAL_RESULTS_TEXT(page_html))
+    match = TOTAL_RESULTS_RE.search(header)
+    if not match:
+        return None
+
+    number, suffix = match.groups()
+    if suffix:
+        # Rounded count, separator is decimal point
+        number = re.sub(r'[^\d.,]', '', number).replace(',', '.')
+        return int(float(number) *
+                   TOTAL_RESULTS_MULTIPLIERS[suffix.upper()])
+    return int(re.sub(r'\D', '', number, flags=re.UNICODE))
+
+
+def probe_page_state(page_html, url=''):
+    """Count elements that end waiting for employees page, the same
+    counts the browser probe of parser returns
+
+    Returns:
+        Dict with counts of cards, paywall, no results and login wall
+    """
+    path = urlparse(url).path
+    login_wall = len(LOGIN_FORM(page_html))
+    if path.startswith('/uas/login') or path.startswith('/authwall'):
+        login_wall += 1
+
+    return {
+        'stale': False,
+        'cards': len(EMPLOYEE_CARDS(page_html)),
+        'paywall': len(ALL_PREMIUM_WARNINGS(page_html)),
+        'no_results': len(NO_RESULTS_MESSAGE(page_html)),
+        'login_wall': login_wall,
+    }
+
+
+def extract_rows_from_source(page_source):
+    """Parse raw html of employees page
+
+    Returns:
+        Tuple (rows, premium_exists, cards_count)
+    """
+    page_html = html.fromstring(page_source)
+    cards = get_employee_cards(page_html)
+    premium_exists = has_premium_warning(cards)
+    rows = extract_rows(cards, premium_exists)
+
+    return rows, premium_exists, len(cards)
+
+
+def extract_rows_from_file(file_path):
+    """Read saved employees page, used by the offline re-parse pool
+
+    Returns:
+        Tuple (file_path, rows)
+    """
+    with open(file_path, 'rb') as f:
+        page_source = f.read()
+
+    try:
+        rows = extract_rows_from_source(page_source)[0]
+    except (etree.ParserError, ValueError):
+        rows = []
+
+    return file_path, rows
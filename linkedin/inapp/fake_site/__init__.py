@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""Offline stand-in of linkedin for load testing of parser.
+
+Set LINKEDIN_BROWSER to 'fake' and parser runs its whole flow against
+generated or recorded pages, see load_test_parser command.
+"""
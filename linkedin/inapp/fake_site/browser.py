@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Selenium browser stand-in that serves pages of FakeSite.
+
+Only webdriver calls made by parser are supported. Scripts of parser
+are not run, their results are computed from the html of current page.
+"""
+import os
+import random
+import time
+from itertools import count
+
+from lxml import html
+from selenium.common.exceptions import (
+    NoSuchElementException, NoSuchWindowException, WebDriverException)
+from selenium.webdriver.common.by import By
+
+from inapp import extractor
+from inapp.parser_linkedin_base import (
+    PAGE_STATE_SCRIPT, PAGE_SETTLED_SCRIPT, TAB_NAVIGATION_SCRIPT)
+
+BY_XPATH_TEMPLATES = {
+    By.ID: '//*[@id="%s"]',
+    By.NAME: '//*[@name="%s"]',
+    By.CLASS_NAME: '//*[contains(concat(" ", normalize-space(@class), " "), '
+                   '" %s ")]',
+    By.TAG_NAME: '//%s',
+    By.XPATH: '%s',
+}
+
+
+class FakeElement(object):
+
+    def __init__(self, browser, element):
+        self._browser = browser
+        self._element = element
+
+    @property
+    def text(self):
+        return self._element.text_content()
+
+    def get_attribute(self, name):
+        return self._element.get(name)
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return self._element.get('disabled') is None
+
+    def send_keys(self, *values):
+        value = self._element.get('value', '') + ''.join(values)
+        self._element.set('value', value)
+        self._browser.element_changed(self._element)
+
+    def click(self):
+        self._browser.element_changed(self._element)
+
+
+class FakeProcess(object):
+    # Browser runs in the parser process, there is nothing to signal
+    pid = os.getpid()
+
+    def send_signal(self, sig):
+        pass
+
+
+class FakeService(object):
+    process = FakeProcess()
+
+
+class FakeSwitchTo(object):
+
+    def __init__(self, browser):
+        self._browser = browser
+
+    def window(self, handle):
+        if handle not in self._browser.tabs:
+            raise NoSuchWindowException('No window %s' % handle)
+        self._browser.current_window_handle = handle
+
+
+class FakeTab(object):
+
+    def __init__(self):
+        self.url = 'about:blank'
+        self.tree = html.fromstring('<html><body></body></html>')
+        # Navigation started by script: (ready time, url)
+        self.navigation = None
+
+
+class FakeBrowser(object):
+    """
+    Args:
+        site: FakeSite that renders pages
+        latency: seconds every page is loaded
+        latency_jitter: random part of latency in seconds added to it
+    """
+    service = FakeService()
+
+    def __init__(self, site, latency=0, latency_jitter=0):
+        self.site = site
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.cookies = {}
+        self.switch_to = FakeSwitchTo(self)
+        self._handles = count()
+        self.tabs = {}
+        self.current_window_handle = self._open_tab()
+
+    def _open_tab(self):
+        handle = 'fake-tab-%d' % next(self._handles)
+        self.tabs[handle] = FakeTab()
+        return handle
+
+    def _get_latency(self):
+        return self.latency + random.random() * self.latency_jitter
+
+    @property
+    def tab(self):
+        tab = self.tabs.get(self.current_window_handle)
+        if tab is None:
+            raise NoSuchWindowException('Current window is closed')
+
+        if tab.navigation and tab.navigation[0] <= time.time():
+            self._load(tab, tab.navigation[1])
+        return tab
+
+    @property
+    def tree(self):
+        return self.tab.tree
+
+    @property
+    def current_url(self):
+        return self.tab.url
+
+    @property
+    def page_source(self):
+        return html.tostring(self.tab.tree, encoding='unicode')
+
+    @property
+    def window_handles(self):
+        return sorted(self.tabs)
+
+    def _load(self, tab, url):
+        tab.url, page_source = self.site.render(url, self.cookies)
+        tab.tree = html.fromstring(page_source)
+        tab.navigation = None
+
+    def get(self, url):
+        # Like real browser get returns when page is loaded
+        tab = self.tab
+        time.sleep(self._get_latency())
+        self._load(tab, url)
+
+    def make_element(self, source):
+        return html.fragment_fromstring(source)
+
+    def element_changed(self, element):
+        if element.get('data-action'):
+            self.site.handle_action(self, element)
+
+    def find_elements(self, by=By.ID, value=None):
+        try:
+            xpath = BY_XPATH_TEMPLATES[by] % value
+        except KeyError:
+            raise WebDriverException('Fake browser can not find by %s' % by)
+        return [FakeElement(self, element)
+                for element in self.tree.xpath(xpath)]
+
+    def find_element(self, by=By.ID, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(
+                'Unable to locate element: %s=%s' % (by, value))
+        return elements[0]
+
+    def find_element_by_id(self, id_):
+        return self.find_element(By.ID, id_)
+
+    def find_element_by_xpath(self, xpath):
+        return self.find_element(By.XPATH, xpath)
+
+    def find_element_by_class_name(self, name):
+        return self.find_element(By.CLASS_NAME, name)
+
+    def execute_script(self, script, *args):
+        if script == PAGE_STATE_SCRIPT:
+            tab = self.tab
+            probe = extractor.probe_page_state(tab.tree, tab.url)
+            probe['stale'] = tab.navigation is not None
+            return probe
+        if script == TAB_NAVIGATION_SCRIPT:
+            self.tab.navigation = (time.time() + self._get_latency(), args[0])
+            return None
+        if 'window.open(' in script:
+            self._open_tab()
+            return None
+        if script.strip() == 'return 1;':
+            return 1
+
+        raise WebDriverException('Fake browser can not run script')
+
+    def execute_async_script(self, script, *args):
+        if script == PAGE_SETTLED_SCRIPT:
+            # Fake pages are rendered at once
+            return len(extractor.get_employee_cards(self.tree))
+
+        raise WebDriverException('Fake browser can not run script')
+
+    def get_cookies(self):
+        return [dict(cookie) for cookie in self.cookies.values()]
+
+    def add_cookie(self, cookie):
+        self.cookies[cookie['name']] = dict(cookie)
+
+    def delete_all_cookies(self):
+        self.cookies = {}
+
+    def set_window_size(self, width, height, windowHandle='current'):
+        pass
+
+    def set_script_timeout(self, time_to_wait):
+        pass
+
+    def set_page_load_timeout(self, time_to_wait):
+        pass
+
+    def close(self):
+        del self.tabs[self.current_window_handle]
+
+    def quit(self):
+        self.tabs = {}
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Pages of the fake linkedin site.
+
+Every page is rendered from a small template with the same classes and
+ids parser waits for on real linkedin. Elements that change the page
+when clicked or typed into have data-action attribute, FakeBrowser
+passes such events to FakeSite.
+"""
+import glob
+import math
+import os
+import zlib
+from urllib import urlencode
+from urlparse import urlparse, parse_qs
+
+from django.conf import settings
+
+AUTH_COOKIE = 'li_at'
+
+LOGIN_PAGE = u'''<html><body>
+<form class="login-form">
+<input id="session_key-login" type="text">
+<input id="session_password-login" type="password">
+<input id="btn-primary" type="submit" data-action="login">
+</form>
+</body></html>'''
+
+VERIFICATION_PAGE = u'''<html><body>
+<form class="verification-form">
+<input id="verification-code" type="text">
+<input type="submit" data-action="verify">
+</form>
+</body></html>'''
+
+GUEST_PAGE = u'''<html><body>
+<h1 class="guest-landing">Welcome to your professional community</h1>
+</body></html>'''
+
+FEED_PAGE = u'''<html><body>
+<nav><button id="nav-settings__dropdown-trigger">Me</button></nav>
+<div class="feed">{content}</div>
+</body></html>'''
+
+COMPANIES_PAGE = u'''<html><body>
+<ul class="results-list">
+<li class="search-result"><div class="search-result__wrapper">
+<a class="search-result__result-link" href="/company/{company_id}/">
+<h3 class="search-result__title">{keywords}</h3>
+</a></div></li>
+</ul>
+</body></html>'''
+
+GEO_FACET = u'''<li class="search-facet search-facet--geo-region">
+<button data-action="expand-geo">Locations</button>
+<fieldset><ol></ol></fieldset>
+</li>'''
+
+ADD_GEO_FACET = u'''<li class="search-s-add-facet">
+<button data-action="add-geo">Add</button>
+</li>'''
+
+GEO_FIELD = u'''<section><div><div><div><div><div>
+<input type="text" data-action="type-geo">
+</div></div></div></div></div></section>'''
+
+GEO_DROPDOWN = u'''<ul class="type-ahead-results">
+<li data-action="choose-geo" data-region="{region}">{geo}</li>
+</ul>'''
+
+PEOPLE_PAGE = u'''<html><body>
+<div class="search-filters"><ul>{geo_facet}</ul></div>
+<h3 class="search-results__total">About {total} results</h3>
+<ul class="results-list">{cards}</ul>
+</body></html>'''
+
+EMPLOYEE_CARD = u'''<li class="search-result search-result__occluded-item">
+<div class="search-result__wrapper">
+<a><h3><span class="name actor-name">{full_name}</span></h3></a>
+<p class="subline-level-1">{title}</p>
+<p class="subline-level-2">{location}</p>
+<p class="search-result__snippets">Current: <strong>{title}</strong>
+at {company}</p>
+</div></li>'''
+
+PAYWALL_CARD = u'''<li class="search-result search-result__occluded-item">
+<div class="search-paywall__warning">
+You've reached the commercial use limit on search.
+</div></li>'''
+
+NO_RESULTS_PAGE = u'''<html><body>
+<h1 class="search-no-results__message">No results found.</h1>
+</body></html>'''
+
+NOT_FOUND_PAGE = u'''<html><body><h1>Page not found</h1></body></html>'''
+
+
+class FakeSite(object):
+    """Fake linkedin: login, company search, geo facet and people pages
+
+    Args:
+        total_results: count of employees of every search
+        paywall_page: first page that shows premium paywall,
+            None if paywall is never shown
+        pages_dir: directory with recorded employees pages, they are
+            served instead of generated ones one by one
+        verification_code: code asked after login form is sent,
+            None if login does not ask it
+    """
+    BASE_URL = 'https://www.linkedin.com/'
+
+    def __init__(self, total_results=250, paywall_page=None,
+                 pages_dir=None, verification_code=None):
+        self.total_results = total_results
+        self.paywall_page = paywall_page
+        self.verification_code = verification_code
+        self.recorded_pages = []
+        if pages_dir:
+            self.recorded_pages = sorted(
+                glob.glob(os.path.join(pages_dir, '*.html')))
+
+    def get_total_pages(self):
+        return min(
+            settings.LINKEDIN_MAX_PAGES,
+            int(math.ceil(
+                float(self.total_results) /
+                settings.LINKEDIN_RESULTS_PER_PAGE)))
+
+    def render(self, url, cookies):
+        """
+        Returns:
+            Tuple (url browser ends on, page source)
+        """
+        parsed = urlparse(url)
+        path = parsed.path
+        query = dict((k, v[0]) for k, v in parse_qs(parsed.query).items())
+        is_authenticated = AUTH_COOKIE in cookies
+
+        if path.startswith('/uas/login'):
+            return url, LOGIN_PAGE
+        if path.startswith('/checkpoint/'):
+            return url, VERIFICATION_PAGE
+        if path in ('', '/'):
+            if is_authenticated:
+                return url, FEED_PAGE.format(content='')
+            return url, GUEST_PAGE
+        if not is_authenticated:
+            return self.BASE_URL + 'authwall', LOGIN_PAGE
+
+        if path.startswith('/search/results/companies/'):
+            return url, self._render_companies(query)
+        if path.startswith('/search/results/people/'):
+            return url, self._render_people(query)
+
+        return url, NOT_FOUND_PAGE
+
+    def _render_companies(self, query):
+        keywords = query.get('keywords', '').decode('utf-8')
+        company_id = zlib.crc32(keywords.encode('utf-8')) % 100000 + 1000
+        return COMPANIES_PAGE.format(
+            company_id=company_id, keywords=keywords)
+
+    def _render_people(self, query):
+        if 'facetCurrentCompany' not in query and \
+                'facetGeoRegion' not in query:
+            # Keyword search, parser picks a region on it
+            return PEOPLE_PAGE.format(
+                geo_facet=GEO_FACET, total=self.total_results, cards='')
+
+        page = int(query.get('page', 1))
+        if page > self.get_total_pages():
+            return NO_RESULTS_PAGE
+        if self.paywall_page is not None and page >= self.paywall_page:
+            return PEOPLE_PAGE.format(
+                geo_facet='', total=self.total_results, cards=PAYWALL_CARD)
+
+        if self.recorded_pages:
+            path = self.recorded_pages[(page - 1) % len(self.recorded_pages)]
+            with open(path, 'rb') as f:
+                return f.read().decode('utf-8')
+
+        first = (page - 1) * settings.LINKEDIN_RESULTS_PER_PAGE
+        last = min(first + settings.LINKEDIN_RESULTS_PER_PAGE,
+                   self.total_results)
+        cards = u''.join(
+            EMPLOYEE_CARD.format(
+                full_name=u'Employee %d' % n, title=u'Engineer',
+                location=u'Kyiv, Ukraine', company=u'Company %d' % (n % 7))
+            for n in range(first, last))
+        return PEOPLE_PAGE.format(
+            geo_facet='', total=self.total_results, cards=cards)
+
+    def _log_in(self, browser):
+        browser.add_cookie({
+            'name': AUTH_COOKIE, 'value': 'fake',
+            'domain': '.linkedin.com', 'path': '/'})
+        browser.get(self.BASE_URL)
+
+    def handle_action(self, browser, element):
+        """Change page of browser the way linkedin scripts do on
+        click or typing into element with data-action attribute
+        """
+        action = element.get('data-action')
+        if action == 'login':
+            if self.verification_code is not None:
+                browser.get(self.BASE_URL + 'checkpoint/challenge/')
+            else:
+                self._log_in(browser)
+        elif action == 'verify':
+            code = browser.tree.get_element_by_id('verification-code').get(
+                'value', '')
+            if code == self.verification_code:
+                self._log_in(browser)
+            else:
+                browser.get(self.BASE_URL + 'checkpoint/challenge/')
+        elif action == 'expand-geo':
+            facet = element.getparent()
+            facet.set('class', facet.get('class') +
+                      ' search-facet--is-expanded')
+            facet.find('fieldset/ol').append(
+                browser.make_element(ADD_GEO_FACET))
+        elif action == 'add-geo':
+            element.getparent().append(browser.make_element(GEO_FIELD))
+        elif action == 'type-geo':
+            geo = element.get('value', '')
+            region = 'fake:%d' % (zlib.crc32(geo.encode('utf-8')) % 10000)
+            browser.tree.find('body').append(browser.make_element(
+                GEO_DROPDOWN.format(region=region, geo=geo)))
+        elif action == 'choose-geo':
+            query = parse_qs(urlparse(browser.current_url).query)
+            browser.get(self.BASE_URL + 'search/results/people/?' + urlencode([
+                ('facetGeoRegion', '["%s"]' % element.get('data-region')),
+                ('keywords', query.get('keywords', [''])[0]),
+                ('origin', 'FACETED_SEARCH'),
+            ]))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Employees pages fetched over http with cookies of selenium session.
+
+Browser is still used for login and composing employees url,
+pages are downloaded by pooled http client and parsed by lxml
+without rendering them in browser.
+"""
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+
+logger = logging.getLogger('linkedin_parser')
+
+
+class HttpPageFetcher(object):
+
+    def __init__(self, browser):
+        self.http = requests.Session()
+        # One keep-alive connection pool for all pages of the search
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=1,
+            max_retries=settings.MAX_REPEAT_LINKEDIN_REQUEST)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        self.http.headers.update({
+            'Accept': 'text/html,application/xhtml+xml',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+        self.copy_browser_session(browser)
+
+    def copy_browser_session(self, browser):
+        # Linkedin checks user agent together with session cookies
+        try:
+            user_agent = browser.execute_script('return navigator.userAgent;')
+            if user_agent:
+                self.http.headers['User-Agent'] = user_agent
+
+            for cookie in browser.get_cookies():
+                self.http.cookies.set(
+                    cookie['name'], cookie['value'],
+                    domain=cookie.get('domain'),
+                    path=cookie.get('path', '/'))
+        except Exception as e:
+            logger.error(e)
+
+    def fetch(self, url):
+        """
+        Returns:
+            Tuple (page source, url after redirects), (None, url) if page
+            can not be loaded
+        """
+        try:
+            response = self.http.get(
+                url, timeout=settings.LINKEDIN_PAGE_TIMEOUT_LAODING)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(e)
+            return None, url
+
+        return response.text, response.url
+
+    def close(self):
+        self.http.close()
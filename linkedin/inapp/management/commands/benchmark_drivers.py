@@ -0,0 +1,340 @@
+# -*- coding: UTF-8 -*-
+import glob
+import os
+import time
+import select
+import socket
+import threading
+import urllib
+import urlparse
+import posixpath
+import SocketServer
+import SimpleHTTPServer
+import BaseHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inapp.drivers import (
+    create_browser, get_browser_options, BROWSER_FACTORIES, BROWSER_FAKE)
+
+PROXY_CONNECT_TIMEOUT = 10
+PROXY_CHUNK_SIZE = 64 * 1024
+
+
+class PagesHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+    """Serves files of pages_dir of its server, working directory
+    of process is not changed
+    """
+
+    def translate_path(self, path):
+        path = posixpath.normpath(
+            urllib.unquote(urlparse.urlsplit(path).path))
+        parts = [part for part in path.split('/')
+                 if part and part not in (os.curdir, os.pardir)]
+        return os.path.join(self.server.pages_dir, *parts)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CountingProxyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Http proxy that counts requests and bytes received from servers.
+
+    Browsers do not report size of cross-origin resources, so transfer
+    is measured on the wire. Blocked hosts are refused, browsers behind
+    proxy do not resolve names themselves.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def _is_blocked(self, host):
+        return any(host == blocked or host.endswith('.' + blocked)
+                   for blocked in self.server.blocked_hosts)
+
+    def _open_upstream(self, host, port):
+        self.server.count(requests=1)
+        if self._is_blocked(host):
+            self.server.count(blocked=1)
+            self.send_error(403, 'Blocked host')
+            return None
+        try:
+            return socket.create_connection(
+                (host, port), PROXY_CONNECT_TIMEOUT)
+        except socket.error as e:
+            self.send_error(502, str(e))
+            return None
+
+    def _relay(self, upstream):
+        """Copy data both ways until one side closes connection
+        """
+        sockets = [self.connection, upstream]
+        while True:
+            readable, _, _ = select.select(sockets, [], [])
+            for sock in readable:
+                data = sock.recv(PROXY_CHUNK_SIZE)
+                if not data:
+                    return
+                if sock is upstream:
+                    self.server.count(bytes=len(data))
+                    self.connection.sendall(data)
+                else:
+                    upstream.sendall(data)
+
+    def do_CONNECT(self):
+        host, _, port = self.path.rpartition(':')
+        upstream = self._open_upstream(host, int(port))
+        if upstream is None:
+            return
+        try:
+            self.send_response(200, 'Connection established')
+            self.end_headers()
+            self._relay(upstream)
+        finally:
+            upstream.close()
+            self.close_connection = 1
+
+    def _forward(self):
+        url = urlparse.urlsplit(self.path)
+        upstream = self._open_upstream(url.hostname, url.port or 80)
+        if upstream is None:
+            return
+        try:
+            # One request per upstream connection, its end is the end
+            # of response
+            path = urlparse.urlunsplit(
+                ('', '', url.path or '/', url.query, ''))
+            lines = ['%s %s HTTP/1.0' % (self.command, path)]
+            for name, value in self.headers.items():
+                if name.lower() in ('connection', 'keep-alive',
+                                    'proxy-connection'):
+                    continue
+                lines.append('%s: %s' % (name, value))
+            lines.append('Connection: close')
+            upstream.sendall('\r\n'.join(lines) + '\r\n\r\n')
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                upstream.sendall(self.rfile.read(length))
+            self._relay(upstream)
+        finally:
+            upstream.close()
+            self.close_connection = 1
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_DELETE = do_OPTIONS = _forward
+
+
+class CountingProxy(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, blocked_hosts):
+        SocketServer.TCPServer.__init__(
+            self, ('127.0.0.1', 0), CountingProxyHandler)
+        self.blocked_hosts = list(blocked_hosts)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def count(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self.counts[name] += value
+
+    def reset(self):
+        """
+        Returns:
+            Counts since previous reset
+        """
+        with self._lock:
+            counts = getattr(self, 'counts', None)
+            self.counts = {'requests': 0, 'blocked': 0, 'bytes': 0}
+        return counts
+
+    @property
+    def address(self):
+        return '%s:%d' % self.server_address
+
+
+class Command(BaseCommand):
+    help = 'Compare page load latency and memory of selenium browsers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--browsers',
+            dest='browsers',
+            default=','.join(sorted(
+                name for name in BROWSER_FACTORIES if name != BROWSER_FAKE)),
+            help='Comma separated browsers to compare, fake browser runs '
+                 'in this process and its memory is not measured')
+        parser.add_argument(
+            '--pages_dir',
+            dest='pages_dir',
+            default=settings.LOGS_DIR,
+            help='Directory with saved employees pages')
+        parser.add_argument(
+            '--repeat',
+            dest='repeat',
+            default=5,
+            help='How many times every page is loaded',
+            type=int)
+        parser.add_argument(
+            '--compare_blocking',
+            dest='compare_blocking',
+            action='store_true',
+            default=False,
+            help='Load pages with resource blocking off and on')
+
+    def _get_rss_kb(self, pid):
+        try:
+            with open('/proc/%d/status' % pid) as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1])
+        except IOError:
+            pass
+        return 0
+
+    def _get_children(self, pid):
+        children = []
+        for name in os.listdir('/proc'):
+            if not name.isdigit():
+                continue
+            try:
+                with open('/proc/%s/stat' % name) as f:
+                    stat = f.read()
+            except IOError:
+                continue
+            # Process name may contain spaces, parent pid follows it
+            ppid = int(stat[stat.rfind(')') + 2:].split()[1])
+            if ppid == pid:
+                children.append(int(name))
+        return children
+
+    def _get_process_tree_rss_kb(self, pid):
+        """
+        Returns:
+            Resident memory of the process and all its descendants
+        """
+        rss = 0
+        pids = [pid]
+        while pids:
+            pid = pids.pop()
+            rss += self._get_rss_kb(pid)
+            pids.extend(self._get_children(pid))
+        return rss
+
+    def _start_pages_server(self, pages_dir):
+        server = SocketServer.TCPServer(('127.0.0.1', 0), PagesHandler)
+        server.pages_dir = pages_dir
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+    def handle(self, *args, **options):
+        """Load saved pages in every browser, report latency and memory
+        """
+        browsers = [b.strip() for b in options['browsers'].split(',')
+                    if b.strip()]
+        for name in browsers:
+            if name not in BROWSER_FACTORIES:
+                raise CommandError('Unknown browser: %s' % name)
+
+        pages_dir = os.path.abspath(options['pages_dir'])
+        paths = sorted(glob.glob(os.path.join(pages_dir, '*.html')))
+        if not paths:
+            raise CommandError('No saved pages found in %s' % pages_dir)
+
+        server = self._start_pages_server(pages_dir)
+        base_url = 'http://127.0.0.1:%d/' % server.server_address[1]
+        urls = [base_url + os.path.basename(path) for path in paths]
+        policies = [None]
+        if options['compare_blocking']:
+            policies = [False, True]
+        try:
+            for name in browsers:
+                for block_resources in policies:
+                    self._benchmark_browser(
+                        name, urls, options['repeat'], block_resources)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def _start_proxy(self, name, block_resources):
+        blocked_hosts = get_browser_options(
+            name, block_resources)['blocked_hosts']
+        proxy = CountingProxy(blocked_hosts)
+        thread = threading.Thread(target=proxy.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return proxy
+
+    def _format_transfer(self, name, transfers):
+        """
+        Returns:
+            Mean requests, blocked requests and bytes of one page,
+            or why they are not measured
+        """
+        if name == BROWSER_FAKE:
+            return 'transfer not measured, fake browser has no network'
+        if not transfers or not any(t['requests'] for t in transfers):
+            return 'transfer not measured, no requests went through proxy'
+        return 'requests/page %.1f, blocked/page %.1f, bytes/page %d' % tuple(
+            float(sum(t[key] for t in transfers)) / len(transfers)
+            for key in ('requests', 'blocked', 'bytes'))
+
+    def _benchmark_browser(self, name, urls, repeat, block_resources):
+        if block_resources is not None:
+            name_shown = '%s (blocking %s)' % (
+                name, 'on' if block_resources else 'off')
+        else:
+            name_shown = name
+
+        proxy = self._start_proxy(name, block_resources)
+        try:
+            self._benchmark_browser_behind_proxy(
+                name, name_shown, urls, repeat, block_resources, proxy)
+        finally:
+            proxy.shutdown()
+            proxy.server_close()
+
+    def _benchmark_browser_behind_proxy(
+            self, name, name_shown, urls, repeat, block_resources, proxy):
+        started = time.time()
+        try:
+            browser = create_browser(name, block_resources, proxy.address)
+        except Exception as e:
+            self.stderr.write('%s: failed to start: %s' % (name_shown, e))
+            return
+        startup = time.time() - started
+
+        latencies = []
+        transfers = []
+        max_rss = 0
+        try:
+            pid = browser.service.process.pid
+            for _ in range(repeat):
+                for url in urls:
+                    proxy.reset()
+                    started = time.time()
+                    browser.get(url)
+                    latencies.append(time.time() - started)
+                    # Requests scripts of page start after load are not counted
+                    transfers.append(proxy.reset())
+                    max_rss = max(
+                        max_rss, self._get_process_tree_rss_kb(pid))
+        finally:
+            browser.quit()
+
+        latencies.sort()
+        if name == BROWSER_FAKE:
+            memory = 'RSS not measured, fake browser has no process'
+        else:
+            memory = 'max RSS %d kB' % max_rss
+        self.stdout.write(
+            '%s: startup %.2fs, pages %d, mean %.3fs, median %.3fs, '
+            'max %.3fs, %s, %s' % (
+                name_shown, startup, len(latencies),
+                sum(latencies) / len(latencies),
+                latencies[len(latencies) // 2], latencies[-1], memory,
+                self._format_transfer(name, transfers)))
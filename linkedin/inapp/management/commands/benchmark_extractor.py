@@ -0,0 +1,159 @@
+# -*- coding: UTF-8 -*-
+import glob
+import os
+import time
+import threading
+
+from lxml import html
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from inapp import extractor
+from inapp.browser_pool import BrowserSession
+from inapp.drivers import BROWSER_FAKE
+from inapp.models import LinkedinSearch, LinkedinUser
+from inapp.parser_linkedin_by_company import LinkedinParserByCompany
+from inapp.tasks import BY_COMPANY_SEARCH_TYPE
+
+MEMORY_SEARCH_TERM = 'Extractor memory benchmark'
+MEMORY_USER_EMAIL = 'benchmark@example.com'
+MEMORY_SAMPLE_INTERVAL = 0.001
+
+
+class Command(BaseCommand):
+    help = 'Measure employees extraction speed on saved result pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages_dir',
+            dest='pages_dir',
+            default=settings.LOGS_DIR,
+            help='Directory with saved employees pages')
+        parser.add_argument(
+            '--repeat',
+            dest='repeat',
+            default=20,
+            help='How many times every page is extracted',
+            type=int)
+        parser.add_argument(
+            '--memory',
+            dest='memory',
+            action='store_true',
+            default=False,
+            help='Report resident memory of every page of parser crawl '
+                 'over saved pages, every page is served repeat times')
+
+    def _get_status_kb(self, name):
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(name + ':'):
+                    return int(line.split()[1])
+        return 0
+
+    def _get_rss_kb(self):
+        return self._get_status_kb('VmRSS')
+
+    def handle(self, *args, **options):
+        """Extract employees from every saved page and report cards/sec
+        """
+        paths = sorted(glob.glob(os.path.join(options['pages_dir'], '*.html')))
+        if not paths:
+            raise CommandError(
+                'No saved pages found in %s' % options['pages_dir'])
+
+        if options['memory']:
+            return self._measure_memory(
+                options['pages_dir'], len(paths) * options['repeat'])
+
+        pages = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                pages.append(html.fromstring(f.read()))
+
+        cards_count = 0
+        rows_count = 0
+        started = time.time()
+        for _ in range(options['repeat']):
+            for page_html in pages:
+                cards = extractor.get_employee_cards(page_html)
+                premium_exists = extractor.has_premium_warning(cards)
+                rows = extractor.extract_rows(cards, premium_exists)
+                cards_count += len(cards)
+                rows_count += len(rows)
+        elapsed = time.time() - started
+
+        if not cards_count:
+            raise CommandError('Saved pages have no employee cards')
+
+        self.stdout.write(
+            'Pages: %d, cards: %d, rows: %d, time: %.3fs' % (
+                len(pages) * options['repeat'], cards_count, rows_count,
+                elapsed))
+        self.stdout.write('Cards/sec: %.1f' % (cards_count / elapsed))
+
+    def _sample_memory(self, session, samples, stopped):
+        """Take resident memory every time browser loads next page
+        """
+        pages_served = session.pages_served
+        while not stopped.is_set():
+            if session.pages_served != pages_served:
+                pages_served = session.pages_served
+                samples.append((pages_served, self._get_rss_kb()))
+            stopped.wait(MEMORY_SAMPLE_INTERVAL)
+
+    def _measure_memory(self, pages_dir, pages_count):
+        """Run crawl loop of parser over saved pages served by fake
+        browser: pages are loaded one by one, parsed by pipeline and
+        saved by result writer. Resident memory should stay flat
+        across pages
+        """
+        if not LinkedinUser.objects.exists():
+            LinkedinUser.objects.create(
+                email=MEMORY_USER_EMAIL, password='benchmark')
+
+        browser_options = dict(settings.LINKEDIN_BROWSER_OPTIONS)
+        browser_options[BROWSER_FAKE] = {
+            'latency': 0, 'pages_dir': pages_dir,
+            'total_results': pages_count * settings.LINKEDIN_RESULTS_PER_PAGE}
+        fake_settings = override_settings(
+            DEBUG=False,
+            LINKEDIN_BROWSER=BROWSER_FAKE,
+            LINKEDIN_BROWSER_OPTIONS=browser_options,
+            LINKEDIN_FETCH_BACKEND='browser',
+            LINKEDIN_PARSER_TABS=1,
+            LINKEDIN_MAX_PAGES=pages_count,
+            SEARCH_SHARD_WORKERS=1)
+
+        samples = []
+        stopped = threading.Event()
+        self.stdout.write('Page 0, RSS: %d kB' % self._get_rss_kb())
+        with fake_settings:
+            session = BrowserSession()
+            parser = LinkedinParserByCompany(session=session)
+            parser.create_new_linkedin_search(
+                MEMORY_SEARCH_TERM, BY_COMPANY_SEARCH_TYPE)
+            search = parser.linkedin_search
+
+            sampler = threading.Thread(
+                target=self._sample_memory,
+                args=(session, samples, stopped))
+            sampler.daemon = True
+            sampler.start()
+            try:
+                parser.parse()
+            finally:
+                stopped.set()
+                sampler.join()
+                session.close()
+
+        search = LinkedinSearch.objects.get(pk=search.id)
+        rows_count = search.linkedinsearchresult_set.count()
+        for npage, rss in samples:
+            self.stdout.write('Page %d, RSS: %d kB' % (npage, rss))
+        self.stdout.write(
+            'Search: %s, pages: %d, rows: %d, peak RSS: %d kB' % (
+                search.get_status_display(), search.scraped_pages,
+                rows_count, self._get_status_kb('VmHWM')))
+        search.delete()
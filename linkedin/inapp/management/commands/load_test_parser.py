@@ -0,0 +1,147 @@
+# -*- coding: UTF-8 -*-
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from inapp.browser_pool import browser_pool
+from inapp.drivers import BROWSER_FAKE
+from inapp.models import LinkedinSearch, LinkedinSearchResult, LinkedinUser
+from inapp.result_writer import WriterStats
+from inapp.tasks import run_new_search, BY_COMPANY_SEARCH_TYPE, \
+    BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE
+
+LOAD_TEST_USER_EMAIL = 'load-test@example.com'
+
+
+class Command(BaseCommand):
+    help = 'Run create_linkedin_search against fake linkedin site ' \
+        'and report parser throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--search_type',
+            dest='search_type',
+            default=BY_COMPANY_SEARCH_TYPE,
+            help='1 - search by company, 2 - search by geo',
+            type=int)
+        parser.add_argument(
+            '--term',
+            dest='term',
+            default='Load test company',
+            help='Search term')
+        parser.add_argument(
+            '--geo',
+            dest='geo',
+            default='Kyiv',
+            help='Region of search by geo')
+        parser.add_argument(
+            '--searches',
+            dest='searches',
+            default=1,
+            help='How many searches are run one by one',
+            type=int)
+        parser.add_argument(
+            '--total_results',
+            dest='total_results',
+            default=250,
+            help='Employees in every search',
+            type=int)
+        parser.add_argument(
+            '--latency',
+            dest='latency',
+            default=0.5,
+            help='Seconds every page is loaded',
+            type=float)
+        parser.add_argument(
+            '--latency_jitter',
+            dest='latency_jitter',
+            default=0,
+            help='Random seconds added to latency',
+            type=float)
+        parser.add_argument(
+            '--paywall_page',
+            dest='paywall_page',
+            default=None,
+            help='First page that asks premium',
+            type=int)
+        parser.add_argument(
+            '--pages_dir',
+            dest='pages_dir',
+            default=None,
+            help='Directory with recorded employees pages to serve')
+        parser.add_argument(
+            '--tabs',
+            dest='tabs',
+            default=settings.LINKEDIN_PARSER_TABS,
+            help='Tabs employees pages are loaded in',
+            type=int)
+
+    def handle(self, *args, **options):
+        """Every search goes through login, search page and all
+        employees pages of fake site
+        """
+        if options['search_type'] not in (
+                BY_COMPANY_SEARCH_TYPE, BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE):
+            raise CommandError(
+                'Unknown search type: %s' % options['search_type'])
+
+        if not LinkedinUser.objects.exists():
+            LinkedinUser.objects.create(
+                email=LOAD_TEST_USER_EMAIL, password='load-test')
+
+        browser_options = dict(settings.LINKEDIN_BROWSER_OPTIONS)
+        browser_options[BROWSER_FAKE] = {
+            'latency': options['latency'],
+            'latency_jitter': options['latency_jitter'],
+            'total_results': options['total_results'],
+            'paywall_page': options['paywall_page'],
+            'pages_dir': options['pages_dir'],
+        }
+        fake_settings = override_settings(
+            DEBUG=False,
+            LINKEDIN_BROWSER=BROWSER_FAKE,
+            LINKEDIN_BROWSER_OPTIONS=browser_options,
+            LINKEDIN_FETCH_BACKEND='browser',
+            LINKEDIN_PARSER_TABS=options['tabs'],
+            SEARCH_SHARD_WORKERS=1)
+
+        last_search = LinkedinSearch.objects.order_by('-id').first()
+        last_search_id = last_search.id if last_search else 0
+
+        # Sessions of other browser must not be reused
+        browser_pool.close_all()
+        db_writes = WriterStats()
+        with fake_settings:
+            started = time.time()
+            for i in range(options['searches']):
+                run_new_search(
+                    options['term'], options['search_type'], options['geo'],
+                    writer_stats=db_writes)
+            elapsed = time.time() - started
+        browser_pool.close_all()
+
+        searches = LinkedinSearch.objects.filter(id__gt=last_search_id)
+        items_count = LinkedinSearchResult.objects.filter(
+            search__in=searches).count()
+        pages_count = 0
+        for search in searches:
+            pages_count += search.scraped_pages
+            self.stdout.write('Search %d: %s, pages %d, results %d' % (
+                search.id, search.get_status_display(), search.scraped_pages,
+                search.linkedinsearchresult_set.count()))
+
+        self.stdout.write(
+            'Searches: %d, pages: %d, items: %d, time: %.2fs' % (
+                searches.count(), pages_count, items_count, elapsed))
+        self.stdout.write('Pages/min: %.1f, items/sec: %.1f' % (
+            pages_count * 60.0 / elapsed, items_count / elapsed))
+        self.stdout.write(
+            'DB writes: %d rows in %d commits, %.3fs, %.1f ms/commit, '
+            'rows/sec %.1f, commits/sec %.2f' % (
+                db_writes.rows_written, db_writes.commits,
+                db_writes.flush_time,
+                db_writes.flush_time * 1000 / max(db_writes.commits, 1),
+                db_writes.rows_written / elapsed,
+                db_writes.commits / elapsed))
@@ -0,0 +1,135 @@
+# -*- coding: UTF-8 -*-
+import glob
+import os
+import time
+from multiprocessing import Pool, cpu_count
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from inapp import extractor
+from inapp.export import delete_export_files
+from inapp.models import LinkedinSearch, LinkedinSearchResult, \
+    STATE_FINISHED
+from inapp.parser_linkedin_base import EMPLOYEES_PAGE_FILE_RE
+from inapp.tasks import start_building_exports
+
+BULK_CREATE_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Re-parse saved employees pages and load results into db'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--search_id',
+            dest='search_id',
+            required=True,
+            help='Linkedin search that receives parsed results',
+            type=int)
+        parser.add_argument(
+            '--pages_dir',
+            dest='pages_dir',
+            default=settings.LOGS_DIR,
+            help='Directory with saved employees pages')
+        parser.add_argument(
+            '--pattern',
+            dest='pattern',
+            default=None,
+            help='File name pattern, by default pages saved for the search')
+        parser.add_argument(
+            '--processes',
+            dest='processes',
+            default=cpu_count(),
+            help='Number of parser processes',
+            type=int)
+        parser.add_argument(
+            '--replace',
+            dest='replace',
+            action='store_true',
+            default=False,
+            help='Delete results of the search on pages that are not '
+                 'loaded, after all pages are loaded')
+
+    def handle(self, *args, **options):
+        """Stream saved pages through extractor in a process pool
+        and bulk load rows into LinkedinSearchResult. Rows of every
+        page replace rows saved for that page before
+        """
+        try:
+            linkedin_search = LinkedinSearch.objects.get(
+                pk=options['search_id'])
+        except LinkedinSearch.DoesNotExist:
+            raise CommandError('Linkedin search not found')
+
+        pattern = options['pattern']
+        if not pattern:
+            pattern = 'search_%d_page_*.html' % linkedin_search.id
+        paths = []
+        page_numbers = {}
+        for path in glob.glob(os.path.join(options['pages_dir'], pattern)):
+            # Page number is in the name of every saved employees page
+            match = EMPLOYEES_PAGE_FILE_RE.match(os.path.basename(path))
+            if match and int(match.group(1)) == linkedin_search.id:
+                paths.append(path)
+                page_numbers[path] = int(match.group(2))
+        if not paths:
+            raise CommandError('No saved pages of search %d match %s' % (
+                linkedin_search.id, pattern))
+        # Page loaded again is saved again, the last one is loaded
+        paths.sort(key=os.path.getmtime)
+
+        # Forked parser processes must not share the db connection
+        connection.close()
+
+        pages_count = 0
+        rows_count = 0
+        loaded_pages = set()
+        pages = {}
+        pages_rows = 0
+        started = time.time()
+        pool = Pool(processes=options['processes'])
+        try:
+            for path, rows in pool.imap(
+                    extractor.extract_rows_from_file, paths, chunksize=4):
+                # Pages without employees: no results, login wall,
+                # not loaded page that was loaded again later
+                if not rows:
+                    continue
+
+                pages_count += 1
+                rows_count += len(rows)
+                # Rows of the page are replaced, so loading is idempotent
+                pages[page_numbers[path]] = rows
+                loaded_pages.add(page_numbers[path])
+                pages_rows += len(rows)
+                if pages_rows >= BULK_CREATE_BATCH_SIZE:
+                    LinkedinSearchResult.save_pages(
+                        linkedin_search, pages.items())
+                    pages = {}
+                    pages_rows = 0
+            if pages:
+                LinkedinSearchResult.save_pages(
+                    linkedin_search, pages.items())
+        finally:
+            pool.close()
+            pool.join()
+
+        if options['replace']:
+            # Results of failed load are kept, loaded pages have
+            # replaced their own rows already
+            LinkedinSearchResult.objects.filter(
+                search=linkedin_search).exclude(
+                    page_number__in=loaded_pages).delete()
+        elapsed = time.time() - started
+
+        # Export files have results before they were rewritten
+        delete_export_files(linkedin_search.id)
+        if linkedin_search.status == STATE_FINISHED:
+            start_building_exports(linkedin_search.id)
+
+        self.stdout.write(
+            'Pages: %d, rows: %d, processes: %d, time: %.3fs' % (
+                pages_count, rows_count, options['processes'], elapsed))
+        self.stdout.write('Pages/sec: %.1f' % (pages_count / elapsed))
@@ -1,9 +1,10 @@
 # -*- coding: UTF-8 -*-
 from django.core.management.base import BaseCommand, CommandError
 
+from inapp.export import delete_export_files
 from inapp.tasks import update_linkedin_search
-from inapp.models import LinkedinSearch, STATE_CONNECTION_REFUSED, \
-    STATE_TASK_RESTARTED
+from inapp.models import LinkedinSearch, LinkedinSearchPage, \
+    STATE_CONNECTION_REFUSED, STATE_TASK_RESTARTED
 
 
 class Command(BaseCommand):
@@ -34,5 +35,9 @@ class Command(BaseCommand):
 
         linkedin_search.status = STATE_TASK_RESTARTED
         linkedin_search.save()
+        # Pages claimed by crashed task are scraped by the restarted one
+        LinkedinSearchPage.release_all(linkedin_search)
+        # Results are rewritten, files are built again when it finishes
+        delete_export_files(linkedin_search.id)
 
         update_linkedin_search.delay(linkedin_search.id)
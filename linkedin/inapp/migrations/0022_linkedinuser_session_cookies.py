@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.6 on 2026-10-18 19:03
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inapp', '0021_linkedinsearch_last_scraped_page'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkedinuser',
+            name='session_cookies',
+            field=models.TextField(blank=True, default=None, null=True, verbose_name='Cookies of authenticated linkedin session'),
+        ),
+    ]
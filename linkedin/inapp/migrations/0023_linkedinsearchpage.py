@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.6 on 2026-10-18 19:07
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inapp', '0022_linkedinuser_session_cookies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkedinSearchPage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.IntegerField(verbose_name='Employees page number')),
+                ('status', models.SmallIntegerField(choices=[(1, 'Page is waiting for worker'), (2, 'Page is claimed by worker'), (3, 'Page is scraped')], default=1, verbose_name='Status of page')),
+                ('worker', models.CharField(blank=True, default=None, max_length=120, null=True, verbose_name='Worker that claimed page')),
+                ('claimed_at', models.DateTimeField(blank=True, default=None, null=True, verbose_name='Date claimed')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='employees_list_url',
+            field=models.TextField(blank=True, default=None, null=True, verbose_name='Employees list url without page number'),
+        ),
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='no_results_page',
+            field=models.IntegerField(blank=True, default=None, null=True, verbose_name='First employees page without results'),
+        ),
+        migrations.AddField(
+            model_name='linkedinsearchpage',
+            name='search',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='inapp.LinkedinSearch', verbose_name='Linkedin Search instance'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='linkedinsearchpage',
+            unique_together=set([('search', 'page_number')]),
+        ),
+    ]
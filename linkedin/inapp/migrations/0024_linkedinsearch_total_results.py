@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.6 on 2026-10-18 19:08
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inapp', '0023_linkedinsearchpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='scraped_pages',
+            field=models.IntegerField(default=0, verbose_name='Count of scraped employees pages'),
+        ),
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='total_pages',
+            field=models.IntegerField(blank=True, default=None, null=True, verbose_name='Count of employees pages to scrape'),
+        ),
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='total_results',
+            field=models.IntegerField(blank=True, default=None, null=True, verbose_name='Total count of employees found by linkedin'),
+        ),
+    ]
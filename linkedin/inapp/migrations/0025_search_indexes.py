@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.6 on 2026-10-18 19:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inapp', '0024_linkedinsearch_total_results'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='linkedinsearch',
+            name='date_created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Date created'),
+        ),
+        migrations.AlterIndexTogether(
+            name='linkedinsearch',
+            index_together=set([('status', 'date_created')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='linkedinsearchresult',
+            index_together=set([('search', 'id')]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.6 on 2026-10-18 19:16
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inapp', '0025_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkedinsearchresult',
+            name='page_number',
+            field=models.IntegerField(blank=True, default=None, null=True, verbose_name='Number of employees page'),
+        ),
+        migrations.AddField(
+            model_name='linkedinsearchresult',
+            name='position',
+            field=models.SmallIntegerField(blank=True, default=None, null=True, verbose_name='Position of employee on page'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='linkedinsearchresult',
+            unique_together=set([('search', 'page_number', 'position')]),
+        ),
+    ]
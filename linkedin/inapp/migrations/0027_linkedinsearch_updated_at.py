@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.6 on 2026-10-18 20:41
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inapp', '0026_linkedinsearchresult_page_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Date updated'),
+            preserve_default=False,
+        ),
+    ]
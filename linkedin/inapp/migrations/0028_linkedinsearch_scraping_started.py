@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.6 on 2026-10-18 19:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inapp', '0027_linkedinsearch_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='scraping_started_at',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Date scraping of pages was started or restarted'),
+        ),
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='scraping_started_pages',
+            field=models.IntegerField(default=0, verbose_name='Count of scraped pages when scraping was started'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.6 on 2026-10-18 19:58
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inapp', '0028_linkedinsearch_scraping_started'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='worker_error_at',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Date one of workers failed'),
+        ),
+        migrations.AddField(
+            model_name='linkedinsearch',
+            name='worker_error_status',
+            field=models.SmallIntegerField(blank=True, choices=[(1, 'Search in process'), (2, 'Search is finished'), (3, 'Search has errors'), (4, 'Linkedin user is not logged in'), (5, 'Linkedin user has been authenticated'), (6, 'Linkedin asks verification code'), (7, 'Linkedin verification code is not valid'), (8, 'No linkedin user was added to the db'), (9, 'Linkedin asks premium'), (10, 'Connection refused'), (11, 'Task has been restarted')], default=None, null=True, verbose_name='Status one of workers failed with'),
+        ),
+    ]
@@ -1,6 +1,15 @@
 from __future__ import unicode_literals
 
-from django.db import models
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Max, Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.core.urlresolvers import reverse
 
@@ -41,6 +50,79 @@ SEARCH_TYPE_CHOICES = (
     (SEARCH_BY_GEO, _('Search by Geo'))
 )
 
+PAGE_PENDING = 1
+PAGE_CLAIMED = 2
+PAGE_DONE = 3
+
+PAGE_STATUS_CHOICES = (
+    (PAGE_PENDING, _('Page is waiting for worker')),
+    (PAGE_CLAIMED, _('Page is claimed by worker')),
+    (PAGE_DONE, _('Page is scraped')),
+)
+
+SEARCHES_VERSION_KEY = 'searches_version'
+SEARCHES_DELETED_KEY = 'searches_deleted_at'
+
+
+def get_searches_version():
+    """Version of searches is shared by web and celery processes
+    through SEARCH_CHANGES_CACHE, it is replaced on every change of searches
+
+    Returns:
+        Tuple (version, date of change)
+    """
+    cache = caches[settings.SEARCH_CHANGES_CACHE]
+    version = cache.get(SEARCHES_VERSION_KEY)
+    if version is None:
+        # Cache was cleared, start new version clients have not seen
+        version = (uuid.uuid4().hex, timezone.now())
+        if not cache.add(SEARCHES_VERSION_KEY, version):
+            version = cache.get(SEARCHES_VERSION_KEY) or version
+    return version
+
+
+def get_searches_deleted_at():
+    """
+    Returns:
+        Date searches were deleted last time, None if it is unknown
+    """
+    return caches[settings.SEARCH_CHANGES_CACHE].get(SEARCHES_DELETED_KEY)
+
+
+def touch_searches_version(deleted=False):
+    """
+    Args:
+        deleted: searches were deleted, changed searches do not show it
+    """
+    def touch():
+        cache = caches[settings.SEARCH_CHANGES_CACHE]
+        now = timezone.now()
+        if deleted:
+            cache.set(SEARCHES_DELETED_KEY, now)
+        cache.set(SEARCHES_VERSION_KEY, (uuid.uuid4().hex, now))
+
+    # Clients must not get new version before the change is visible
+    transaction.on_commit(touch)
+
+
+class LinkedinSearchQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        # Queryset update skips auto_now fields and post_save signal
+        kwargs.setdefault('updated_at', timezone.now())
+        updated = super(LinkedinSearchQuerySet, self).update(**kwargs)
+        if updated:
+            touch_searches_version()
+        return updated
+
+    def lock(self):
+        """Take write lock on searches without changing them. Dummy
+        update takes write lock on sqlite too, which has no select
+        for update and fails to upgrade read lock later
+        """
+        return super(LinkedinSearchQuerySet, self).update(
+            no_results_page=F('no_results_page'))
+
 
 class LinkedinSearch(models.Model):
     search_term = models.CharField(
@@ -50,7 +132,7 @@ class LinkedinSearch(models.Model):
         default=None, null=True, blank=True,
         verbose_name=_('Linkedin company ID'))
     date_created = models.DateTimeField(
-        auto_now_add=True, verbose_name=_('Date created'))
+        auto_now_add=True, db_index=True, verbose_name=_('Date created'))
     status = models.SmallIntegerField(
         default=1, choices=STATUS_CHOICES, verbose_name=_('Status of search'))
     search_type = models.SmallIntegerField(
@@ -61,6 +143,85 @@ class LinkedinSearch(models.Model):
     last_scraped_page = models.IntegerField(
         default=None, null=True, blank=True,
         verbose_name=_('Last scraped employees page'))
+    employees_list_url = models.TextField(
+        default=None, null=True, blank=True,
+        verbose_name=_('Employees list url without page number'))
+    no_results_page = models.IntegerField(
+        default=None, null=True, blank=True,
+        verbose_name=_('First employees page without results'))
+    total_results = models.IntegerField(
+        default=None, null=True, blank=True,
+        verbose_name=_('Total count of employees found by linkedin'))
+    total_pages = models.IntegerField(
+        default=None, null=True, blank=True,
+        verbose_name=_('Count of employees pages to scrape'))
+    scraped_pages = models.IntegerField(
+        default=0, verbose_name=_('Count of scraped employees pages'))
+    scraping_started_at = models.DateTimeField(
+        default=None, null=True, blank=True,
+        verbose_name=_('Date scraping of pages was started or restarted'))
+    scraping_started_pages = models.IntegerField(
+        default=0,
+        verbose_name=_('Count of scraped pages when scraping was started'))
+    worker_error_status = models.SmallIntegerField(
+        default=None, null=True, blank=True, choices=STATUS_CHOICES,
+        verbose_name=_('Status one of workers failed with'))
+    worker_error_at = models.DateTimeField(
+        default=None, null=True, blank=True,
+        verbose_name=_('Date one of workers failed'))
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name=_('Date updated'))
+
+    objects = LinkedinSearchQuerySet.as_manager()
+
+    class Meta:
+        # Searches of one status in order they were created
+        index_together = (('status', 'date_created'),)
+
+    def get_progress(self):
+        """
+        Returns:
+            Percent of scraped pages, None if count of pages is unknown
+        """
+        if not self.total_pages:
+            return None
+        return min(100, self.scraped_pages * 100 // self.total_pages)
+
+    def get_eta(self):
+        """Estimate by average time of pages scraped since scraping
+        was started, waits for worker, login and restart are not counted
+
+        Returns:
+            Seconds left to finish search, None if can not be estimated
+        """
+        if self.status != STATE_IN_PROCESS or not self.total_pages or \
+                self.scraping_started_at is None:
+            return None
+
+        scraped_pages = self.scraped_pages - self.scraping_started_pages
+        if scraped_pages <= 0:
+            return None
+
+        elapsed = (timezone.now() - self.scraping_started_at).total_seconds()
+        pages_left = max(0, self.total_pages - self.scraped_pages)
+        return int(elapsed / scraped_pages * pages_left)
+
+    def start_scraping(self):
+        # Eta is measured from here, pages scraped before are not counted.
+        # Failures of workers of previous run are not actual any more
+        LinkedinSearch.objects.filter(pk=self.id).update(
+            scraping_started_at=timezone.now(),
+            scraping_started_pages=F('scraped_pages'),
+            worker_error_status=None, worker_error_at=None)
+
+    def set_worker_error(self, status):
+        """Failure of worker that could not set status of search
+        while other workers scrape it
+        """
+        self.worker_error_status = status
+        self.worker_error_at = timezone.now()
+        LinkedinSearch.objects.filter(pk=self.id).update(
+            worker_error_status=status, worker_error_at=self.worker_error_at)
 
     def as_dict(self):
         date_created = self.date_created.strftime("%Y-%m-%d %H:%M:%S")
@@ -74,6 +235,13 @@ class LinkedinSearch(models.Model):
             'status': self.status,
             'status_text': self.get_status_display(),
             'status_icon': status_icons(self.status),
+            'worker_error': self.get_worker_error_status_display()
+            if self.worker_error_status else None,
+            'total_results': self.total_results,
+            'total_pages': self.total_pages,
+            'scraped_pages': self.scraped_pages,
+            'progress': self.get_progress(),
+            'eta': self.get_eta(),
             'search_details_url': reverse(
                 'inapp:search-details', kwargs={'pk': self.id}),
             'employees_to_csv': reverse(
@@ -81,9 +249,204 @@ class LinkedinSearch(models.Model):
         }
         return result
 
+    def save(self, *args, **kwargs):
+        # Date of change is saved with any changed field
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['updated_at']
+        super(LinkedinSearch, self).save(*args, **kwargs)
+        touch_searches_version()
+
     def __str__(self):
         return self.search_term
 
+    def set_no_results_page(self, page_numb):
+        # Keep the lowest page, workers may find the end independently
+        LinkedinSearch.objects.filter(pk=self.id).filter(
+            Q(no_results_page__isnull=True) |
+            Q(no_results_page__gt=page_numb)).update(
+                no_results_page=page_numb)
+        if self.no_results_page is None or self.no_results_page > page_numb:
+            self.no_results_page = page_numb
+
+    def set_total_results(self, total_results):
+        """Count of pages for progress and eta. Linkedin count is
+        approximate, end of search is found by page without results
+        """
+        total_pages = min(
+            settings.LINKEDIN_MAX_PAGES,
+            -(-total_results // settings.LINKEDIN_RESULTS_PER_PAGE))
+
+        self.total_results = total_results
+        self.total_pages = total_pages
+        LinkedinSearch.objects.filter(pk=self.id).update(
+            total_results=total_results, total_pages=total_pages)
+
+    def set_last_scraped_page(self, page_numb):
+        # Pages are scraped by several workers, keep the highest one
+        LinkedinSearch.objects.filter(pk=self.id).filter(
+            Q(last_scraped_page__isnull=True) |
+            Q(last_scraped_page__lt=page_numb)).update(
+                last_scraped_page=page_numb)
+        if self.last_scraped_page is None or \
+                self.last_scraped_page < page_numb:
+            self.last_scraped_page = page_numb
+
+
+@receiver(post_delete, sender=LinkedinSearch)
+def touch_searches_version_on_delete(sender, **kwargs):
+    # Admin and queryset delete send it for every deleted search
+    touch_searches_version(deleted=True)
+
+
+class LinkedinSearchPage(models.Model):
+    """Employees page of linkedin search claimed by workers, so several
+    workers can scrape page ranges of the same search
+    """
+    search = models.ForeignKey(
+        'LinkedinSearch', related_name='pages',
+        verbose_name=_('Linkedin Search instance'))
+    page_number = models.IntegerField(verbose_name=_('Employees page number'))
+    status = models.SmallIntegerField(
+        default=PAGE_PENDING, choices=PAGE_STATUS_CHOICES,
+        verbose_name=_('Status of page'))
+    worker = models.CharField(
+        default=None, null=True, blank=True,
+        max_length=120, verbose_name=_('Worker that claimed page'))
+    claimed_at = models.DateTimeField(
+        default=None, null=True, blank=True,
+        verbose_name=_('Date claimed'))
+
+    class Meta:
+        unique_together = (('search', 'page_number'),)
+
+    @classmethod
+    def claim(cls, search, worker, count):
+        """Claim next range of pages: pending pages, pages of workers
+        that did not finish in time, new pages after the last one
+
+        Returns:
+            List of claimed page numbers, empty list if nothing left
+        """
+        for attempt in range(settings.MAX_REPEAT_LINKEDIN_REQUEST):
+            try:
+                return cls._claim(search, worker, count)
+            except IntegrityError:
+                # Other worker has created the same new pages
+                continue
+        return []
+
+    @classmethod
+    def _claim(cls, search, worker, count):
+        with transaction.atomic():
+            # Lock search row, so workers claim pages one by one
+            LinkedinSearch.objects.filter(pk=search.id).lock()
+            search = LinkedinSearch.objects.get(pk=search.id)
+
+            qs = cls._get_free_pages(search)
+            page_numbers = list(qs.order_by('page_number').values_list(
+                'page_number', flat=True)[:count])
+
+            if not page_numbers:
+                last_page = cls.objects.filter(search=search).aggregate(
+                    Max('page_number'))['page_number__max']
+                if last_page is None:
+                    # Search was started before pages were tracked
+                    last_page = search.last_scraped_page or 0
+                end_page = last_page + 1 + count
+                if search.no_results_page is not None:
+                    end_page = min(end_page, search.no_results_page)
+                page_numbers = range(last_page + 1, end_page)
+                cls.objects.bulk_create([
+                    cls(search=search, page_number=page_numb)
+                    for page_numb in page_numbers])
+
+            cls.objects.filter(
+                search=search, page_number__in=page_numbers).update(
+                    status=PAGE_CLAIMED, worker=worker,
+                    claimed_at=timezone.now())
+
+        return list(page_numbers)
+
+    @classmethod
+    def _get_free_pages(cls, search):
+        """
+        Returns:
+            Queryset of pages before the end of search that are pending
+            or claimed by workers that did not finish in time
+        """
+        stale_date = timezone.now() - timedelta(
+            seconds=settings.SEARCH_PAGE_CLAIM_TIMEOUT)
+        qs = cls.objects.filter(search=search).filter(
+            Q(status=PAGE_PENDING) |
+            Q(status=PAGE_CLAIMED, claimed_at__lt=stale_date))
+        if search.no_results_page is not None:
+            qs = qs.filter(page_number__lt=search.no_results_page)
+        return qs
+
+    @classmethod
+    def has_free_pages(cls, search):
+        """
+        Returns:
+            True if pages were released or claims expired after the
+            search ran out of pages to claim, False otherwise
+        """
+        search = LinkedinSearch.objects.get(pk=search.id)
+        return cls._get_free_pages(search).exists()
+
+    @classmethod
+    def is_claimed_by_others(cls, search, worker):
+        """
+        Returns:
+            True if other worker scrapes pages of the search,
+            False otherwise
+        """
+        stale_date = timezone.now() - timedelta(
+            seconds=settings.SEARCH_PAGE_CLAIM_TIMEOUT)
+        return cls.objects.filter(
+            search=search, status=PAGE_CLAIMED,
+            claimed_at__gte=stale_date).exclude(worker=worker).exists()
+
+    @classmethod
+    def release_all(cls, search):
+        # Workers of restarted search are gone, their pages are free
+        cls.objects.filter(search=search, status=PAGE_CLAIMED).update(
+            status=PAGE_PENDING, worker=None, claimed_at=None)
+
+    @classmethod
+    def release(cls, search, worker):
+        # Return not scraped pages of worker to other workers
+        cls.objects.filter(
+            search=search, worker=worker, status=PAGE_CLAIMED).update(
+                status=PAGE_PENDING, worker=None, claimed_at=None)
+
+    @classmethod
+    def mark_done(cls, search, page_numbers):
+        updated = cls.objects.filter(
+            search=search, page_number__in=page_numbers).exclude(
+                status=PAGE_DONE).update(status=PAGE_DONE)
+        if updated:
+            LinkedinSearch.objects.filter(pk=search.id).update(
+                scraped_pages=F('scraped_pages') + updated)
+
+    @classmethod
+    def is_search_complete(cls, search):
+        """
+        Returns:
+            True if end of search is found and
+            all pages before it are scraped, False otherwise
+        """
+        search = LinkedinSearch.objects.get(pk=search.id)
+        if search.no_results_page is None:
+            return False
+
+        return not cls.objects.filter(
+            search=search, page_number__lt=search.no_results_page).exclude(
+                status=PAGE_DONE).exists()
+
+    def __str__(self):
+        return '%s: %d' % (self.search_id, self.page_number)
+
 
 class LinkedinSearchResult(models.Model):
     first_name = models.CharField(
@@ -103,6 +466,63 @@ class LinkedinSearchResult(models.Model):
         max_length=250, verbose_name=_('Location'))
     search = models.ForeignKey(
         'LinkedinSearch', verbose_name=_('Linkedin Search instance'))
+    page_number = models.IntegerField(
+        default=None, null=True, blank=True,
+        verbose_name=_('Number of employees page'))
+    position = models.SmallIntegerField(
+        default=None, null=True, blank=True,
+        verbose_name=_('Position of employee on page'))
+
+    class Meta:
+        # Employees of search are always listed in order they were saved
+        index_together = (('search', 'id'),)
+        # Page scraped again after restart can not add duplicates
+        unique_together = (('search', 'page_number', 'position'),)
+
+    @classmethod
+    def save_pages(cls, search, pages):
+        """Replace employees of the pages and mark pages scraped
+        in one transaction, so page can be saved again at any time
+
+        Args:
+            pages: list of tuples (page number, rows)
+        """
+        page_numbers = [page_numb for page_numb, rows in pages]
+        empls = [cls.from_row(search, row, page_numb, position)
+                 for page_numb, rows in pages
+                 for position, row in enumerate(rows, 1)]
+
+        with transaction.atomic():
+            cls.objects.filter(
+                search=search, page_number__in=page_numbers).delete()
+            cls.objects.bulk_create(empls)
+            search.set_last_scraped_page(max(page_numbers))
+            LinkedinSearchPage.mark_done(search, page_numbers)
+
+    @classmethod
+    def from_row(cls, search, row, page_number=None, position=None):
+        """Build unsaved instance from extractor row tuple
+        (full_name, title, location, current_company)
+        """
+        full_name, title, location, current_company = row
+
+        last_name = None
+        if 'LinkedIn' in full_name:
+            first_name = full_name
+        else:
+            name = full_name.rsplit(' ', 1)
+            first_name = name[0] if len(name) > 0 else None
+            last_name = name[1] if len(name) > 1 else None
+
+        return cls(
+            search=search,
+            first_name=first_name,
+            last_name=last_name,
+            title=title,
+            location=location,
+            current_company=current_company,
+            page_number=page_number,
+            position=position)
 
     def __str__(self):
         last_name = self.last_name
@@ -122,6 +542,9 @@ class LinkedinUser(models.Model):
     verification_code = models.CharField(
         default=None, null=True, blank=True, max_length=30,
         verbose_name=_('Linkedin verification code'))
+    session_cookies = models.TextField(
+        default=None, null=True, blank=True,
+        verbose_name=_('Cookies of authenticated linkedin session'))
 
     def __str__(self):
         return self.email
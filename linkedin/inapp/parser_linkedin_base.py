@@ -1,18 +1,29 @@
 # -*- coding: utf-8 -*-
 from lxml import html
+import os
+import re
+import json
 import time
-import signal
+import heapq
+import socket
 import logging
+from uuid import uuid4
+from contextlib import contextmanager
 
-from selenium import webdriver
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 
 from django.conf import settings
 
-from models import LinkedinSearchResult, LinkedinUser, \
+import extractor
+from browser_pool import BrowserSession
+from pipeline import PagePipeline
+from result_writer import ResultWriter
+from search_events import publish_search_event
+from http_fetcher import HttpPageFetcher
+from models import LinkedinUser, LinkedinSearch, LinkedinSearchPage, \
     STATE_IN_PROCESS, STATE_FINISHED, STATE_AUTHENTICATED, \
     STATE_ASKS_CODE, STATE_CODE_NOT_VALID, STATE_LINKEDIN_USER_EMPTY, \
     STATE_ERROR, STATE_ASKS_PREMIUM, STATE_NOT_LOGGED_IN, \
@@ -24,6 +35,112 @@ PAGE_HAS_NO_RESULTS = 1
 PAGE_IS_LOADED = 2
 PAGE_IS_NOT_LOADED = 3
 PAGE_URL_NOT_COMPOSED = 4
+PAGE_ASKS_PREMIUM = 5
+PAGE_LOGIN_WALL = 6
+
+# Search status of pages that stop the crawl
+PAGE_FINAL_SEARCH_STATUSES = {
+    PAGE_IS_NOT_LOADED: STATE_CONNECTION_REFUSED,
+    PAGE_ASKS_PREMIUM: STATE_ASKS_PREMIUM,
+    PAGE_LOGIN_WALL: STATE_NOT_LOGGED_IN,
+}
+
+# Set in tab before loading next page, the variable
+# is gone when new document of the page is loaded
+TAB_NAVIGATION_SCRIPT = '''
+window.linkedinParserStalePage = true;
+window.location.href = arguments[0];
+'''
+
+# Counts every element that ends waiting for employees page,
+# evaluated in browser with one request per poll
+PAGE_STATE_SCRIPT = '''
+var count = function(selector) {
+    return document.querySelectorAll(selector).length;
+};
+var path = window.location.pathname;
+return {
+    stale: window.linkedinParserStalePage === true,
+    cards: count('li[class*="search-result__occluded-item"]'),
+    paywall: count('div[class*="search-paywall__warning"]'),
+    no_results: count('h1[class*="search-no-results__message"]'),
+    login_wall: count('#session_key-login, form[class*="login-form"]') +
+        (path.indexOf('/uas/login') === 0 ? 1 : 0) +
+        (path.indexOf('/authwall') === 0 ? 1 : 0)
+};
+'''
+
+# Async probe: scrolls page by step after every quiet period without
+# changes of count of rendered employees in the results list and calls
+# back with the count once it is stable at the bottom of the page
+PAGE_SETTLED_SCRIPT = '''
+var quietPeriod = arguments[0];
+var scrollStep = arguments[1];
+var done = arguments[arguments.length - 1];
+var selector = 'li[class*="search-result__occluded-item"] ' +
+    'div[class*="search-result__wrapper"]';
+var observer = null;
+var timer = null;
+var settledCount = -1;
+
+var count = function() {
+    return document.querySelectorAll(selector).length;
+};
+var observedCount = count();
+var arm = function() {
+    clearTimeout(timer);
+    timer = setTimeout(settle, quietPeriod);
+};
+var settle = function() {
+    var current = count();
+    var atBottom = window.pageYOffset + window.innerHeight >=
+        document.body.scrollHeight - 1;
+    if (atBottom && current === settledCount) {
+        if (observer) {
+            observer.disconnect();
+        }
+        done(current);
+        return;
+    }
+    settledCount = current;
+    window.scrollBy(0, scrollStep);
+    arm();
+};
+
+// Only changes of rendered employees count restart quiet period,
+// other changes of the page (ads, presence, timestamps) are ignored
+var onMutation = function() {
+    var current = count();
+    if (current !== observedCount) {
+        observedCount = current;
+        arm();
+    }
+};
+var card = document.querySelector(
+    'li[class*="search-result__occluded-item"]');
+if (window.MutationObserver && card && card.parentNode) {
+    observer = new MutationObserver(onMutation);
+    observer.observe(card.parentNode, {childList: true, subtree: true});
+}
+arm();
+'''
+
+# Name of saved employees page: search id, page number, time
+EMPLOYEES_PAGE_FILE_NAME = 'search_%d_page_%d_%s.html'
+EMPLOYEES_PAGE_FILE_RE = re.compile(r'^search_(\d+)_page_(\d+)_')
+
+SESSION_COOKIE_KEYS = (
+    'name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expiry')
+
+
+@contextmanager
+def log_step_duration(step_name):
+    # Log how long the step of linkedin flow takes
+    started = time.time()
+    try:
+        yield
+    finally:
+        logger.info('%s took %.2fs' % (step_name, time.time() - started))
 
 
 class BaseLinkedinParser(object):
@@ -32,6 +149,7 @@ class BaseLinkedinParser(object):
     search_status = None
     search_term = None
     employees_list_url = None
+    final_search_status = None
     user = None
 
     LOGIN_BUTTON_XPATH = '//input[@type="submit"]'
@@ -43,8 +161,19 @@ class BaseLinkedinParser(object):
     def __init__(self, *args, **kwargs):
         self.user = self._get_linkedin_user()
 
-        self.browser = webdriver.PhantomJS()
-        self.browser.set_window_size(1024, 768)
+        # Session leased from browser pool stays open after parse
+        self.session = kwargs.get('session')
+        self._owns_session = self.session is None
+        if self._owns_session:
+            self.session = BrowserSession()
+        self.browser = self.session.browser
+
+        # Db writes of all result writers of parser are added to it
+        self.writer_stats = kwargs.get('writer_stats')
+
+        # Identifies pages of linkedin search claimed by this parser
+        self.worker_id = '%s:%d:%s' % (
+            socket.gethostname(), os.getpid(), uuid4().hex[:8])
 
     def create_new_linkedin_search(self):
         """Should create new linkedin_search
@@ -80,16 +209,27 @@ class BaseLinkedinParser(object):
 
     def _selenium_element_load_waiting(
             self, by_selector_type, selector,
-            success_msg='', timeout_exception_msg=''):
+            success_msg='', timeout_exception_msg='', timeout=None):
         """Wrapper around explicity waiting for
         elememt will appear in selenium browser
         """
+        element_present = EC.presence_of_element_located(
+            (by_selector_type, selector))
+        return self._selenium_condition_waiting(
+            element_present, success_msg=success_msg,
+            timeout_exception_msg=timeout_exception_msg, timeout=timeout)
+
+    def _selenium_condition_waiting(
+            self, condition, success_msg='', timeout_exception_msg='',
+            timeout=None):
+        """Wrapper around explicity waiting for
+        expected condition in selenium browser
+        """
+        if timeout is None:
+            timeout = settings.LINKEDIN_PAGE_TIMEOUT_LAODING
+
         try:
-            element_present = EC.presence_of_element_located(
-                (by_selector_type, selector))
-            WebDriverWait(
-                self.browser, settings.LINKEDIN_PAGE_TIMEOUT_LAODING).until(
-                    element_present)
+            WebDriverWait(self.browser, timeout).until(condition)
             logger.info(success_msg)
         except TimeoutException:
             logger.error(timeout_exception_msg)
@@ -101,27 +241,127 @@ class BaseLinkedinParser(object):
         return True
 
     def _update_search_status(self, status):
+        """Status of search is shared by all workers of the search.
+        Finished search is not changed any more, other statuses are set
+        only when no other worker scrapes pages of the search, till then
+        they are kept as failure of worker
+
+        Returns:
+            True if status of search is changed, False otherwise
+        """
         self.search_status = status
+        if not self.linkedin_search:
+            return False
+
+        if status != STATE_FINISHED and \
+                LinkedinSearchPage.is_claimed_by_others(
+                    self.linkedin_search, self.worker_id):
+            logger.warning('Search is scraped by other worker, its status '
+                           'is not changed to %d' % status)
+            if status != STATE_IN_PROCESS and status != STATE_AUTHENTICATED:
+                self.linkedin_search.set_worker_error(status)
+                publish_search_event(self.linkedin_search.id)
+            return False
+
+        # Other fields are updated by pages pipeline and other workers
+        updated = LinkedinSearch.objects.filter(
+            pk=self.linkedin_search.id).exclude(
+                status=STATE_FINISHED).update(status=status)
+        if not updated:
+            return False
 
         self.linkedin_search.status = status
-        self.linkedin_search.save()
+        publish_search_event(self.linkedin_search.id)
+        return True
 
     def _close_selenium_browser(self):
-        try:
-            self.browser.service.process.send_signal(signal.SIGTERM)
-            self.browser.quit()
-        except OSError as e:
-            logger.error(e)
+        # Leased sessions are returned to the browser pool by the task
+        if self._owns_session:
+            self.session.close()
 
     def parse(self):
         """Use selenium to authenticate and load linkedin page
         """
-        if self.linkedin_search:
-            self._open_login_page()
-            self._make_login()
-            self._make_search()
+        try:
+            if self.linkedin_search:
+                if not self._is_session_authenticated() and \
+                        not self._restore_session_cookies():
+                    self._open_login_page()
+                    self._make_login()
+                self._make_search()
+        except Exception:
+            # Search must not stay in process after parser is gone
+            if self.linkedin_search:
+                self._update_search_status(STATE_ERROR)
+            raise
+        finally:
+            self._close_selenium_browser()
+
+    def _is_session_authenticated(self):
+        """Check warm browser session is still logged in as current user
+
+        Returns:
+            True if login can be skipped, False otherwise
+        """
+        if not self.user or \
+                self.session.authenticated_user_id != self.user.id:
+            return False
+
+        try:
+            self.browser.get(self.LINKEDIN_URL)
+        except Exception as e:
+            logger.error(e)
+            return False
+
+        return self._is_user_auth(
+            timeout=settings.LINKEDIN_SESSION_CHECK_TIMEOUT)
+
+    def _restore_session_cookies(self):
+        """Load stored cookies of authenticated session into browser
+
+        Returns:
+            True if restored session is logged in, False otherwise
+        """
+        if not self.user or not self.user.session_cookies:
+            return False
 
-        self._close_selenium_browser()
+        try:
+            cookies = json.loads(self.user.session_cookies)
+            # Cookies can be added only for the domain opened in browser
+            self.browser.get(self.LINKEDIN_URL)
+            self.browser.delete_all_cookies()
+            for cookie in cookies:
+                self.browser.add_cookie(cookie)
+            self.browser.get(self.LINKEDIN_URL)
+        except Exception as e:
+            logger.error(e)
+            return False
+
+        is_authenticated = self._is_user_auth(
+            timeout=settings.LINKEDIN_SESSION_CHECK_TIMEOUT)
+        if is_authenticated:
+            logger.info('Session restored from stored cookies')
+        else:
+            logger.info('Stored session cookies are expired')
+        return is_authenticated
+
+    def _store_session_cookies(self):
+        # Save cookies of authenticated session for next searches
+        cookies = []
+        try:
+            for cookie in self.browser.get_cookies():
+                cookie = dict((k, v) for k, v in cookie.items()
+                              if k in SESSION_COOKIE_KEYS)
+                if cookie.get('expiry'):
+                    cookie['expiry'] = int(cookie['expiry'])
+                cookies.append(cookie)
+        except Exception as e:
+            logger.error(e)
+            return None
+
+        self.user.session_cookies = json.dumps(cookies)
+        LinkedinUser.objects.filter(pk=self.user.id).update(
+            session_cookies=self.user.session_cookies)
 
     def _open_login_page(self):
         try:
@@ -143,6 +383,9 @@ class BaseLinkedinParser(object):
         if not is_authenticated:
             self._try_verification_code_from_db()
 
+        if self.search_status == STATE_AUTHENTICATED:
+            self._store_session_cookies()
+
     def _post_login_data_with_selenium(self):
         try:
             email = self.browser.find_element_by_id("session_key-login")
@@ -161,7 +404,7 @@ class BaseLinkedinParser(object):
         except Exception as e:
             logger.error(e)
 
-    def _is_user_auth(self):
+    def _is_user_auth(self, timeout=None):
         """Check substituted in selenium user is authenticated on linkedin
 
         Returns:
@@ -170,15 +413,18 @@ class BaseLinkedinParser(object):
         elem_exists = self._selenium_element_load_waiting(
             By.ID, 'nav-settings__dropdown-trigger',
             success_msg='User authenticated',
-            timeout_exception_msg='Timed out waiting for user login')
+            timeout_exception_msg='Timed out waiting for user login',
+            timeout=timeout)
 
         file_name = 'auth_%s_%s.html' % (self.search_term, str(time.time()))
         self.save_page_to_log_if_debug(file_name)
 
         if elem_exists:
+            self.session.authenticated_user_id = self.user.id
             self._update_search_status(STATE_AUTHENTICATED)
             return True
         else:
+            self.session.authenticated_user_id = None
             return False
 
     def _try_verification_code_from_db(self):
@@ -189,9 +435,12 @@ class BaseLinkedinParser(object):
         """
         asks_verification = self._asks_code_verification()
         if asks_verification:
+            # Code saved before user is asked for it is not the new one,
+            # it is read from db right before the status asks for code
+            previous_code = self._get_verification_code_qs().first()
             self._update_search_status(STATE_ASKS_CODE)
 
-            verified = self._substitute_verification_code()
+            verified = self._substitute_verification_code(previous_code)
             if not verified:
                 self._update_search_status(STATE_CODE_NOT_VALID)
         else:
@@ -214,15 +463,18 @@ class BaseLinkedinParser(object):
             return False
         return True
 
-    def _substitute_verification_code(self):
+    def _substitute_verification_code(self, previous_code):
         """Try to substitute and send verification code in selenium browser
 
+        Args:
+            previous_code: code in db before user was asked for new one
+
         Returns:
             Check function: _is_user_auth
         """
         logger.info('Start waiting for user set verification code')
-        time.sleep(180)
-        logger.info('End waiting')
+        with log_step_duration('Waiting for verification code'):
+            self._wait_for_verification_code(previous_code)
 
         self.user = self._get_linkedin_user()
         try:
@@ -238,6 +490,33 @@ class BaseLinkedinParser(object):
 
         return self._is_user_auth()
 
+    def _get_verification_code_qs(self):
+        return LinkedinUser.objects.filter(pk=self.user.id).values_list(
+            'verification_code', flat=True)
+
+    def _wait_for_verification_code(self, previous_code):
+        """Poll db with short interval until new verification code
+        is saved for linkedin user or max waiting time is over
+
+        Args:
+            previous_code: code in db before user was asked for new one
+
+        Returns:
+            True if new code was saved, False otherwise
+        """
+        code_qs = self._get_verification_code_qs()
+
+        deadline = time.time() + settings.VERIFICATION_CODE_MAX_WAIT
+        while time.time() < deadline:
+            code = code_qs.first()
+            if code and code != previous_code:
+                logger.info('New verification code is saved')
+                return True
+            time.sleep(settings.VERIFICATION_CODE_POLL_INTERVAL)
+
+        logger.info('Timed out waiting for new verification code')
+        return False
+
     def _make_search(self):
         """Make linkedin search
         """
@@ -248,294 +527,577 @@ class BaseLinkedinParser(object):
             self._update_search_status(STATE_ERROR)
             return None
 
-        self.set_employees_list_url()
+        # Url is composed once, restarted tasks and
+        # other workers of the search reuse it
+        is_new_url = False
+        if self.linkedin_search.employees_list_url:
+            self.employees_list_url = self.linkedin_search.employees_list_url
+        else:
+            self.set_employees_list_url()
+            is_new_url = True
+
         if not self.employees_list_url:
             self._update_search_status(STATE_ERROR)
             return None
         else:
             self._update_search_status(STATE_IN_PROCESS)
 
-        start_page_number = 1
-        if self.linkedin_search.last_scraped_page:
-            start_page_number = self.linkedin_search.last_scraped_page + 1
+        # The first worker of started or restarted search starts timer
+        # of eta, workers that join it do not
+        if not LinkedinSearchPage.is_claimed_by_others(
+                self.linkedin_search, self.worker_id):
+            self.linkedin_search.start_scraping()
+
+        if is_new_url:
+            self.linkedin_search.employees_list_url = self.employees_list_url
+            self.linkedin_search.save(update_fields=['employees_list_url'])
+            self._start_shard_workers()
 
-        self._get_next_list_of_employees(start_page_number)
+        self._get_next_list_of_employees()
 
-    def _get_next_list_of_employees(self, page_numb):
-        """Recursive function that call oneself if new items exists on page
+    def _start_shard_workers(self):
+        """Other workers join the search with their own browser
+        sessions and claim its pages too
+        """
+        from tasks import update_linkedin_search
+
+        for i in range(settings.SEARCH_SHARD_WORKERS - 1):
+            update_linkedin_search.delay(self.linkedin_search.id)
+
+    def _iter_claimed_page_numbers(self):
+        # Claim ranges of pages until the search has no free pages
+        while True:
+            page_numbers = LinkedinSearchPage.claim(
+                self.linkedin_search, self.worker_id,
+                settings.SEARCH_SHARD_PAGES)
+            if not page_numbers:
+                return
+
+            logger.info('Pages %s are claimed by %s' % (
+                page_numbers, self.worker_id))
+            for page_numb in page_numbers:
+                yield page_numb
+
+    def _get_next_list_of_employees(self):
+        """Scrape claimed pages until the search has no free pages.
+        Pages released by other workers or with expired claims are
+        scraped before the worker exits. Search is finished by the
+        worker that scraped its last page
+        """
+        while True:
+            self._scrape_claimed_pages()
+            if self.final_search_status is not None:
+                break
+
+            if LinkedinSearchPage.is_search_complete(self.linkedin_search):
+                self.final_search_status = STATE_FINISHED
+                break
+            if not LinkedinSearchPage.has_free_pages(self.linkedin_search):
+                # The last worker reports failure of other worker that
+                # left pages of search not scraped
+                self.final_search_status = self._get_worker_error()
+                break
+
+        # Final status is set only when all loaded pages are saved
+        is_changed = False
+        if self.final_search_status:
+            is_changed = self._update_search_status(self.final_search_status)
+        if is_changed and self.final_search_status == STATE_FINISHED:
+            logger.info('Search completed')
+            self._start_building_exports()
+
+    def _get_worker_error(self):
+        """
+        Returns:
+            Status other worker failed with, None if other workers still
+            scrape the search or did not fail
+        """
+        if LinkedinSearchPage.is_claimed_by_others(
+                self.linkedin_search, self.worker_id):
+            return None
+        return LinkedinSearch.objects.filter(
+            pk=self.linkedin_search.id).values_list(
+                'worker_error_status', flat=True).first()
+
+    def _scrape_claimed_pages(self):
+        """Flat loop over claimed employees pages.
+        Browser moves on to the next page while previous pages
+        are parsed and saved by pipeline threads.
         Stop if linkedin asks premium account or no items returns
         """
-        load_page_status = self._load_employees_page(page_numb)
+        self.final_search_status = None
+        pipeline = PagePipeline(
+            self._parse_employees_page,
+            ResultWriter(self.linkedin_search, stats=self.writer_stats),
+            maxsize=settings.PIPELINE_QUEUE_SIZE)
+        if settings.LINKEDIN_FETCH_BACKEND == 'http':
+            iter_pages = self._iter_employees_pages_over_http
+        elif settings.LINKEDIN_PARSER_TABS > 1:
+            iter_pages = self._iter_employees_pages_in_tabs
+        else:
+            iter_pages = self._iter_employees_pages
 
-        file_name = '%s_%s.html' % (self.search_term, str(time.time()))
-        self.save_page_to_log_if_debug(file_name)
+        try:
+            page_numbers = self._iter_claimed_page_numbers()
+            for npage, page_source in iter_pages(page_numbers):
+                pipeline.put(npage, page_source)
+                if pipeline.is_stopped:
+                    break
+        finally:
+            try:
+                pipeline.close()
+            except Exception as e:
+                # Pages that are not saved stay not scraped in db
+                logger.exception(e)
+                self.final_search_status = STATE_ERROR
+            finally:
+                LinkedinSearchPage.release(
+                    self.linkedin_search, self.worker_id)
 
-        if load_page_status == PAGE_HAS_NO_RESULTS:
-            self._update_search_status(STATE_FINISHED)
-            logger.info('Search completed')
-            return None
+        if pipeline.stopped_on_page is not None:
+            self.final_search_status = STATE_ASKS_PREMIUM
 
-        if load_page_status == PAGE_IS_NOT_LOADED:
-            self._update_search_status(STATE_CONNECTION_REFUSED)
-            return None
+    def _start_building_exports(self):
+        from tasks import start_building_exports
 
-        employees_list = self._retrive_employees_from_html()
+        start_building_exports(self.linkedin_search.id)
 
-        premium_exists = self._check_premium_exists(employees_list)
-        if premium_exists and len(employees_list) == 1:
-            self._update_search_status(STATE_ASKS_PREMIUM)
-            return None
+    def _iter_employees_pages(self, page_numbers):
+        """Generator of loaded employees pages, sets final_search_status
+        if pages can not be loaded
+
+        Yields:
+            Tuple (page number, page source)
+        """
+        for page_numb in page_numbers:
+            no_results_page = self.linkedin_search.no_results_page
+            if no_results_page is not None and page_numb >= no_results_page:
+                continue
 
-        items = self._get_items(employees_list, page_numb, premium_exists)
-        self._save_items_to_db(items, page_numb)
+            load_page_status = self._load_employees_page(page_numb)
 
-        self._get_next_list_of_employees(page_numb+1)
+            self.save_page_to_log_if_debug(
+                self._get_employees_page_file_name(page_numb))
 
-    def _retrive_employees_from_html(self):
-        employees_list = []
-        try:
-            page_html = html.fromstring(self.browser.page_source)
-            xp = '//li[contains(@class, "search-result__occluded-item")]'
-            employees_list = page_html.xpath(xp)
-        except Exception as e:
-            logger.error(e)
+            if load_page_status == PAGE_HAS_NO_RESULTS:
+                self.linkedin_search.set_no_results_page(page_numb)
+                continue
+
+            if load_page_status in PAGE_FINAL_SEARCH_STATUSES:
+                self._set_final_status_by_page(load_page_status)
+                return
 
-        return employees_list
+            try:
+                page_source = self.browser.page_source
+            except Exception as e:
+                logger.error(e)
+                self.final_search_status = STATE_CONNECTION_REFUSED
+                return
+
+            if self.linkedin_search.total_results is None:
+                self._set_total_results(page_source)
+
+            yield page_numb, page_source
+
+    def _set_final_status_by_page(self, load_page_status):
+        if load_page_status == PAGE_LOGIN_WALL:
+            self.session.authenticated_user_id = None
+        self.final_search_status = \
+            PAGE_FINAL_SEARCH_STATUSES[load_page_status]
 
-    def _check_premium_exists(self, employees_list):
-        """Check if linkedin asks for premium
+    def _iter_employees_pages_over_http(self, page_numbers):
+        """Download employees pages with http client that has cookies
+        of authenticated browser session
+
+        Yields:
+            Tuple (page number, page source)
+        """
+        fetcher = HttpPageFetcher(self.browser)
+        try:
+            for page_numb in page_numbers:
+                if self._is_after_last_page(page_numb):
+                    continue
+
+                page_url = self._compose_employees_page_url(page_numb)
+                with log_step_duration('Fetching page %d' % page_numb):
+                    page_source, url = fetcher.fetch(page_url)
+                load_page_status = self._classify_page_source(
+                    page_source, url)
+
+                # Page of browser is not the one that failed to download
+                if page_source is not None:
+                    self.save_page_to_log_if_debug(
+                        self._get_employees_page_file_name(page_numb),
+                        page_source=page_source)
+
+                if load_page_status == PAGE_HAS_NO_RESULTS:
+                    self.linkedin_search.set_no_results_page(page_numb)
+                    continue
+
+                if load_page_status in PAGE_FINAL_SEARCH_STATUSES:
+                    self._set_final_status_by_page(load_page_status)
+                    return
+
+                if self.linkedin_search.total_results is None:
+                    self._set_total_results(page_source)
+
+                yield page_numb, page_source
+        finally:
+            fetcher.close()
+
+    def _classify_page_source(self, page_source, url):
+        """
         Returns:
-            True if premium block exists, False otherwise
+            Page status of downloaded employees page
         """
-        if employees_list:
-            premium_exists = employees_list[0].xpath(
-                './/div[contains(@class, "search-paywall__warning")]')
-            if premium_exists:
-                return True
+        if not page_source:
+            return PAGE_IS_NOT_LOADED
 
-        return False
+        try:
+            probe = extractor.probe_page_state(
+                html.fromstring(page_source), url)
+        except Exception as e:
+            logger.error(e)
+            return PAGE_IS_NOT_LOADED
+
+        # Downloaded page does not change, it is as settled as it gets
+        load_page_status = self._classify_page_state(probe, probe)
+        if load_page_status is None:
+            logger.error('Downloaded page has no employees block')
+            return PAGE_IS_NOT_LOADED
+        return load_page_status
+
+    def _iter_employees_pages_in_tabs(self, page_numbers):
+        """Keep LINKEDIN_PARSER_TABS employees pages loading at the same
+        time in tabs of one browser session. Page is taken from the tab
+        that is ready first, pages are yielded in order of page numbers
+
+        Yields:
+            Tuple (page number, page source)
+        """
+        page_numbers = iter(page_numbers)
+        handles = self._open_tabs(settings.LINKEDIN_PARSER_TABS)
+        timeout = settings.LINKEDIN_PAGE_TIMEOUT_LAODING * \
+            settings.MAX_REPEAT_LINKEDIN_REQUEST
+        loading = {}
+        loaded = {}
+        last_probes = {}
+        pending = []
+        no_more_pages = False
 
-    def _load_employees_page(self, page_numb):
-        # Try to load employees page
-        self._open_employees_url_in_browser(page_numb)
+        try:
+            while True:
+                for handle in handles:
+                    if handle in loading or no_more_pages:
+                        continue
+                    page_numb = self._next_page_number(page_numbers)
+                    if page_numb is None:
+                        no_more_pages = True
+                        continue
+                    self._start_loading_in_tab(handle, page_numb)
+                    loading[handle] = (page_numb, time.time())
+                    last_probes.pop(handle, None)
+                    heapq.heappush(pending, page_numb)
+
+                # Yield ready pages in order, drop pages after the last one
+                while pending and (pending[0] in loaded or
+                                   self._is_after_last_page(pending[0])):
+                    page_numb = heapq.heappop(pending)
+                    page_source = loaded.pop(page_numb, None)
+                    if page_source is not None and \
+                            not self._is_after_last_page(page_numb):
+                        yield page_numb, page_source
+
+                if not loading and not pending:
+                    return
+
+                for handle, (page_numb, started) in loading.items():
+                    load_page_status = self._probe_tab(handle, last_probes)
+                    if load_page_status is None:
+                        if time.time() - started < timeout:
+                            continue
+                        logger.error('Timed out waiting for employees page '
+                                     'number %d state' % page_numb)
+                        load_page_status = PAGE_IS_NOT_LOADED
+                    del loading[handle]
+
+                    if load_page_status in PAGE_FINAL_SEARCH_STATUSES:
+                        self._set_final_status_by_page(load_page_status)
+                        return
+
+                    if load_page_status == PAGE_HAS_NO_RESULTS:
+                        self.linkedin_search.set_no_results_page(page_numb)
+                        continue
+
+                    with log_step_duration('Settling page %d' % page_numb):
+                        self._wait_page_is_settled(page_numb)
+                    try:
+                        page_source = self.browser.page_source
+                    except Exception as e:
+                        logger.error(e)
+                        self.final_search_status = STATE_CONNECTION_REFUSED
+                        return
+
+                    self.save_page_to_log_if_debug(
+                        self._get_employees_page_file_name(page_numb),
+                        page_source=page_source)
+                    if self.linkedin_search.total_results is None:
+                        self._set_total_results(page_source)
+                    loaded[page_numb] = page_source
+
+                time.sleep(settings.PAGE_STATE_POLL_INTERVAL)
+        finally:
+            self._close_tabs(handles)
+
+    def _next_page_number(self, page_numbers):
+        for page_numb in page_numbers:
+            if not self._is_after_last_page(page_numb):
+                return page_numb
+        return None
 
-        first_part_loaded = self._wait_first_part_is_loaded(page_numb)
-        if first_part_loaded:
-            second_part_loaded = self._wait_second_part_is_loaded(page_numb)
-            if second_part_loaded:
-                return PAGE_IS_LOADED
+    def _is_after_last_page(self, page_numb):
+        no_results_page = self.linkedin_search.no_results_page
+        return no_results_page is not None and page_numb >= no_results_page
 
-        has_at_least_one_employee = self._page_has_at_least_one_employee(
-            page_numb)
-        if has_at_least_one_employee:
-            return PAGE_IS_LOADED
+    def _open_tabs(self, count):
+        """
+        Returns:
+            Window handles of current tab and new opened tabs
+        """
+        handles = [self.browser.current_window_handle]
+        for i in range(count - 1):
+            try:
+                self.browser.execute_script('window.open("about:blank");')
+            except Exception as e:
+                logger.error(e)
+                break
+            handles.extend(h for h in self.browser.window_handles
+                           if h not in handles)
 
-        has_no_results_msg = self._page_has_no_results_msg()
-        if has_no_results_msg:
-            return PAGE_HAS_NO_RESULTS
+        logger.info('Employees pages are loaded in %d tabs' % len(handles))
+        return handles
 
-        return PAGE_IS_NOT_LOADED
+    def _close_tabs(self, handles):
+        try:
+            for handle in handles[1:]:
+                self.browser.switch_to.window(handle)
+                self.browser.close()
+            self.browser.switch_to.window(handles[0])
+        except Exception as e:
+            logger.error(e)
 
-    def _open_employees_url_in_browser(self, page_numb):
+    def _start_loading_in_tab(self, handle, page_numb):
+        # Navigate from script, so browser does not wait for page load
         try:
-            employees_url_with_page = '&'.join([
-                self.employees_list_url, 'page=%d' % page_numb])
-            self.browser.get(employees_url_with_page)
+            self.browser.switch_to.window(handle)
+            self.browser.execute_script(
+                TAB_NAVIGATION_SCRIPT,
+                self._compose_employees_page_url(page_numb))
+            self.session.page_served()
         except Exception as e:
             logger.error(e)
 
-    def _wait_first_part_is_loaded(self, page):
-        """Waiting for first part employees page loaded in selenium browser
+    def _probe_tab(self, handle, last_probes):
+        """
+        Args:
+            last_probes: previous probe of every tab, updated by this one
 
         Returns:
-            True if first part of page has been loaded, False if not
+            Page status if page in tab is ready, None otherwise
         """
-        timeout_exception_msg = 'Timed out waiting for ' \
-            'employees page number %d to load' % page
-        last_el_entry = '//li[contains(@class, ' \
-            '"search-result__occluded-item")][5]'
-
-        elem_exists = False
-        repeat_request_count = 0
-        while (not elem_exists and repeat_request_count <
-               settings.MAX_REPEAT_LINKEDIN_REQUEST):
-            repeat_request_count += 1
-            success_msg = 'First part of employees %d page ' \
-                'is loaded from %d attempt' % (page, repeat_request_count)
-            elem_exists = self._selenium_element_load_waiting(
-                By.XPATH, last_el_entry,
-                success_msg=success_msg,
-                timeout_exception_msg=timeout_exception_msg)
+        try:
+            self.browser.switch_to.window(handle)
+            probe = self.browser.execute_script(PAGE_STATE_SCRIPT)
+        except WebDriverException as e:
+            logger.error(e)
+            return None
 
-        if not elem_exists:
-            return False
-        return True
+        previous_probe = last_probes.get(handle)
+        last_probes[handle] = probe
+        return self._classify_page_state(probe, previous_probe)
 
-    def _wait_second_part_is_loaded(self, page):
-        """Waiting for second part of employees page loaded
+    def _set_total_results(self, page_source):
+        # Parse results header of the first loaded page for progress of search
+        try:
+            total_results = extractor.extract_total_results(
+                html.fromstring(page_source))
+        except Exception as e:
+            logger.error(e)
+            return None
 
-        Returns:
-            True part has been loaded, False otherwise
-        """
-        self._scroll_employees_page()
-
-        last_el_entry = '//li[contains(@class, ' \
-            '"search-result__occluded-item")][10]/' \
-            'div/div[contains(@class, "search-result__wrapper")]'
-        timeout_excp_msg = 'Timed out waiting for all employees to load'
-
-        elem_exists = False
-        repeat_request_count = 0
-        while (not elem_exists and repeat_request_count <
-               settings.MAX_REPEAT_LINKEDIN_REQUEST):
-            repeat_request_count += 1
-            success_msg = 'Employees page number %d after scroll ' \
-                'is loaded from %d attempt' % (page, repeat_request_count)
-            elem_exists = self._selenium_element_load_waiting(
-                By.XPATH, last_el_entry, success_msg=success_msg,
-                timeout_exception_msg=timeout_excp_msg)
+        if total_results is None:
+            logger.info('Employees page has no total results header')
+            return None
 
-        if not elem_exists:
-            return False
-        return True
+        self.linkedin_search.set_total_results(total_results)
+        logger.info('Search has %d results on %d pages' % (
+            total_results, self.linkedin_search.total_pages))
 
-    def _scroll_employees_page(self):
-        """After scrolling page in browser
-        new employees are becoming available
+    def _parse_employees_page(self, page_source, page_numb):
+        """Get all items(linkedin users) from loaded employees page.
+        Row tuples hold plain strings that do not refer to the page
+        tree (see extractor), so the tree is released as soon as
+        page is parsed
+
+        Returns:
+            List of row tuples, see extractor module,
+            None if page has only premium warning
         """
         try:
-            self.browser.execute_script(
-                "window.scrollTo(0, document.body.scrollHeight);")
+            items, premium_exists, cards_count = \
+                extractor.extract_rows_from_source(page_source)
         except Exception as e:
             logger.error(e)
+            items, premium_exists, cards_count = [], False, 0
 
-    def _page_has_at_least_one_employee(self, page):
-        first_el_entry = '//li[contains(@class, ' \
-            '"search-result__occluded-item")][1]'
+        if premium_exists and cards_count == 1:
+            return None
 
-        s_msg = 'Page number %d has at least one employee' % page
-        timeout_excp_msg = 'Page has no employees'
-        elem_exists = self._selenium_element_load_waiting(
-            By.XPATH, first_el_entry,
-            success_msg=s_msg, timeout_exception_msg=timeout_excp_msg)
+        skipped = cards_count - len(items) - int(premium_exists)
+        if skipped:
+            logger.error('Full name is not found in %d entries' % skipped)
 
-        if not elem_exists:
-            return False
-        return True
+        logger.info('Add %d items from page number %d' % (
+            len(items), page_numb))
+        return items
+
+    def _load_employees_page(self, page_numb):
+        # Try to load employees page
+        self._open_employees_url_in_browser(page_numb)
+
+        with log_step_duration('Waiting for page %d state' % page_numb):
+            page_state = self._wait_page_state(page_numb)
+
+        if page_state == PAGE_IS_LOADED:
+            # Page has at least one employee, wait for the rest of them
+            with log_step_duration('Settling page %d' % page_numb):
+                self._wait_page_is_settled(page_numb)
+
+        return page_state
+
+    def _wait_page_state(self, page):
+        """Poll employees page for every terminal condition at once:
+        employees, no results message, premium paywall, login wall
 
-    def _page_has_no_results_msg(self):
-        """
         Returns:
-            True if no results linkedin message found, False otherwise
+            Page status of the first condition appeared on page,
+            PAGE_IS_NOT_LOADED if no one appeared in time
         """
+        last_probe = {}
+
+        def page_state(browser):
+            try:
+                probe = browser.execute_script(PAGE_STATE_SCRIPT)
+            except WebDriverException as e:
+                logger.error(e)
+                return None
+            previous_probe = last_probe.get('probe')
+            last_probe['probe'] = probe
+            return self._classify_page_state(probe, previous_probe)
+
+        timeout = settings.LINKEDIN_PAGE_TIMEOUT_LAODING * \
+            settings.MAX_REPEAT_LINKEDIN_REQUEST
         try:
-            self.browser.find_element_by_xpath(
-                '//h1[contains(@class, "search-no-results__message")]')
-            logger.info('On current page "has no results" block exists')
-        except NoSuchElementException:
-            return False
+            return WebDriverWait(
+                self.browser, timeout,
+                poll_frequency=settings.PAGE_STATE_POLL_INTERVAL).until(
+                    page_state)
+        except TimeoutException:
+            logger.error('Timed out waiting for employees page '
+                         'number %d state' % page)
         except Exception as e:
             logger.error(e)
-            return False
 
-        return True
+        return PAGE_IS_NOT_LOADED
 
-    def _get_items(self, employees_list, npage, premium_exists=False):
-        """Get all items(linkedin users) from loaded employees page
+    def _classify_page_state(self, probe, previous_probe=None):
+        """
+        Args:
+            probe: counts of PAGE_STATE_SCRIPT
+            previous_probe: counts of the same page on previous poll
 
         Returns:
-            Items list, empty list if has errors in parse data with xpath
+            Page status by counts of PAGE_STATE_SCRIPT,
+            None if page is not ready yet
         """
-        items = []
-        for i, employee in enumerate(employees_list):
-            if premium_exists and i == 0:
-                continue
+        if probe['stale']:
+            return None
+        if probe['login_wall']:
+            logger.info('Linkedin shows login page instead of employees')
+            return PAGE_LOGIN_WALL
+        if probe['no_results']:
+            logger.info('On current page "has no results" block exists')
+            return PAGE_HAS_NO_RESULTS
+        if probe['paywall'] and probe['cards'] <= 1:
+            # Employees could be rendered after the paywall card yet,
+            # page asks premium when counts are the same on two polls
+            if not self._is_probe_stable(probe, previous_probe):
+                return None
+            logger.info('Linkedin asks premium on current page')
+            return PAGE_ASKS_PREMIUM
+        if probe['cards']:
+            return PAGE_IS_LOADED
 
-            full_name = self._get_full_name(employee)
-            if not full_name:
-                continue
+        return None
 
-            items.append({
-                'full_name': full_name,
-                'title': self._get_title(employee),
-                'location': self._get_location(employee),
-                'current_company': self._get_current_company(employee)})
+    def _is_probe_stable(self, probe, previous_probe):
+        if previous_probe is None or previous_probe['stale']:
+            return False
+        return previous_probe['paywall'] == probe['paywall'] and \
+            previous_probe['cards'] == probe['cards']
 
-        logger.info('Add %d items from page number %d' % (len(items), npage))
-        return items
+    def _compose_employees_page_url(self, page_numb):
+        return '&'.join([self.employees_list_url, 'page=%d' % page_numb])
 
-    def _get_full_name(self, employee):
+    def _open_employees_url_in_browser(self, page_numb):
         try:
-            full_name = employee.xpath(
-                './/span[contains(@class, "actor-name")]/text()')[0]
-        except Exception:
-            full_name = None
-            logger.error('Full name is not found in entry')
+            self.browser.get(self._compose_employees_page_url(page_numb))
+            self.session.page_served()
+        except Exception as e:
+            logger.error(e)
 
-        return full_name
+    def _wait_page_is_settled(self, page):
+        """Scroll employees page step by step until count of rendered
+        employees stays the same for quiet period at the bottom of page
 
-    def _get_title(self, employee):
+        Returns:
+            True if page is settled, False otherwise
+        """
+        quiet_period_ms = int(settings.PAGE_SETTLE_QUIET_PERIOD * 1000)
         try:
-            title = employee.xpath(
-                './/p[contains(@class, "subline-level-1")]/text()')[0]
-        except Exception:
-            title = None
-
-        return title
+            self.browser.set_script_timeout(
+                settings.LINKEDIN_PAGE_TIMEOUT_LAODING)
+            employees_count = self.browser.execute_async_script(
+                PAGE_SETTLED_SCRIPT, quiet_period_ms,
+                settings.PAGE_SCROLL_STEP)
+        except TimeoutException:
+            logger.error('Timed out waiting for employees page '
+                         'number %d to settle' % page)
+            return False
+        except Exception as e:
+            logger.error(e)
+            return False
 
-    def _get_location(self, employee):
-        try:
-            location = employee.xpath(
-                './/p[contains(@class, "subline-level-2")]/text()')[0]
-        except Exception:
-            location = None
+        logger.info('Employees page number %d is settled with %d '
+                    'employees' % (page, employees_count))
+        return True
 
-        return location
+    def _get_employees_page_file_name(self, page_numb):
+        # Saved pages are found by reparse_saved_pages by search and page
+        return EMPLOYEES_PAGE_FILE_NAME % (
+            self.linkedin_search.id, page_numb, str(time.time()))
 
-    def _get_current_company(self, employee):
-        company_xpath = './/p[contains(@class, ' \
-            '"search-result__snippets")]//text()'
-        try:
-            current_company = employee.xpath(company_xpath)
-            current_company = ' '.join(
-                current_company).replace('Current:', '')
-        except Exception:
-            current_company = ''
-
-        return current_company.strip()
-
-    def _save_items_to_db(self, items, page_numb):
-        # Save items (linkedin users) to db
-        empls = []
-        for item in items:
-            last_name = None
-            if 'LinkedIn' in item['full_name']:
-                first_name = item['full_name']
-            else:
-                name = item['full_name'].rsplit(' ', 1)
-                first_name = name[0] if len(name) > 0 else None
-                last_name = name[1] if len(name) > 1 else None
-
-            empls.append(LinkedinSearchResult(
-                search=self.linkedin_search,
-                first_name=first_name,
-                last_name=last_name,
-                title=item['title'],
-                location=item['location'].strip(),
-                current_company=item['current_company'].strip()))
-        LinkedinSearchResult.objects.bulk_create(empls)
-
-        self.linkedin_search.last_scraped_page = page_numb
-        self.linkedin_search.save()
-
-    def save_page_to_log_if_debug(self, file_name, debug=False):
+    def save_page_to_log_if_debug(self, file_name, debug=False,
+                                  page_source=None):
         # Write html pages to project logs dir if DEBUG setting is True
         if settings.DEBUG or debug:
             file_path = '%s/%s' % (
                 settings.LOGS_DIR, file_name.replace(' ', '_'))
             logger.info('Path to employees list html file: %s' % file_path)
             try:
-                page = self.browser.page_source.encode('utf-8')
+                if page_source is None:
+                    page_source = self.browser.page_source
+                page = page_source.encode('utf-8')
             except Exception as e:
                 logger.error(e)
                 return None
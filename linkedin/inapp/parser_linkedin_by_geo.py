@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
-import time
 import logging
 
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
 
-from parser_linkedin_base import BaseLinkedinParser
+from parser_linkedin_base import BaseLinkedinParser, log_step_duration
 from models import LinkedinSearch
 
 logger = logging.getLogger('linkedin_parser')
@@ -14,6 +14,16 @@ class LinkedinParserByGeo(BaseLinkedinParser):
     REGION_BLOCK_EXPANDED_XPATH = '//li[contains(@class,' \
         '"search-facet--geo-region") and ' \
         'contains(@class, "search-facet--is-expanded")]'
+    ADDING_REGION_LINK_XPATH = '//li[contains(@class, ' \
+        '"search-facet--geo-region")]/fieldset/ol/' \
+        'li[contains(@class, "search-s-add-facet")]/button'
+    REGION_FIELD_XPATH = '//li[contains(@class, ' \
+        '"search-facet--geo-region")]/fieldset/ol/' \
+        'li[contains(@class, "search-s-add-facet")]/' \
+        'section/div/div/div/div/div/input'
+    FIRST_REGION_XPATH = '//ul[contains(@class, ' \
+        '"type-ahead-results")]/li[1]'
+    REGION_URL_PARAM = 'facetGeoRegion'
     SEARCH_BY_KEYWORD_URL = 'search/results/people/?keywords=%s' \
         '&origin=FACETED_SEARCH'
 
@@ -49,29 +59,32 @@ class LinkedinParserByGeo(BaseLinkedinParser):
         """Load page with region
         Set url with region for LinkedIn employees search
         """
-        base_supervisors_page = self._load_base_geo_page()
+        with log_step_duration('Loading base geo page'):
+            base_supervisors_page = self._load_base_geo_page()
         if not base_supervisors_page:
             return None
 
-        region_block_expanded = self._is_region_block_expanded()
-        if not region_block_expanded:
-            result = self._make_expanded_region_block()
-            if not result:
-                return None
+        with log_step_duration('Expanding region block'):
+            region_block_expanded = self._is_region_block_expanded()
+            if not region_block_expanded:
+                result = self._make_expanded_region_block()
+                if not result:
+                    return None
 
-        location_field_added = self._add_location_into_search_field()
+        with log_step_duration('Adding location into region field'):
+            location_field_added = self._add_location_into_search_field()
         if not location_field_added:
             return None
 
-        # explicity wait for region drop down menu is loaded
-        time.sleep(30)
-
-        dropdown_opened = self._click_first_from_dropdown()
+        with log_step_duration('Choosing region from dropdown'):
+            dropdown_opened = self._click_first_from_dropdown()
         if not dropdown_opened:
             return None
 
-        # explicity wait for reload page after region was setted
-        time.sleep(30)
+        with log_step_duration('Reloading search page with region'):
+            region_is_set = self._wait_region_in_url()
+        if not region_is_set:
+            return None
 
         return True
 
@@ -136,8 +149,6 @@ class LinkedinParserByGeo(BaseLinkedinParser):
         corresponding region field on linkedin page
         """
         self._show_region_field()
-        # explicity wait for region field is loaded
-        time.sleep(10)
         elem_exists = self._insert_val_into_region_field()
 
         if not elem_exists:
@@ -145,31 +156,33 @@ class LinkedinParserByGeo(BaseLinkedinParser):
         return True
 
     def _show_region_field(self):
+        link_clickable = EC.element_to_be_clickable(
+            (By.XPATH, self.ADDING_REGION_LINK_XPATH))
+        self._selenium_condition_waiting(
+            link_clickable,
+            success_msg='Adding region link is clickable',
+            timeout_exception_msg='Timed out waiting for adding region link')
+
         try:
-            adding_region_link_xpath = '//li[contains(@class, ' \
-                '"search-facet--geo-region")]/fieldset/ol/' \
-                'li[contains(@class, "search-s-add-facet")]/button'
-            el = self.browser.find_element_by_xpath(adding_region_link_xpath)
-            time.sleep(5)
+            el = self.browser.find_element_by_xpath(
+                self.ADDING_REGION_LINK_XPATH)
             el.click()
             logger.info('Display region field on the page')
         except Exception as e:
             logger.error(e)
 
     def _insert_val_into_region_field(self):
-        region_field_xpath = '//li[contains(@class, ' \
-            '"search-facet--geo-region")]/fieldset/ol/' \
-            'li[contains(@class, "search-s-add-facet")]/' \
-            'section/div/div/div/div/div/input'
+        field_visible = EC.visibility_of_element_located(
+            (By.XPATH, self.REGION_FIELD_XPATH))
         timeout_exception_msg = 'Timed out waiting for adding region field'
-        elem_exists = self._selenium_element_load_waiting(
-            By.XPATH, region_field_xpath,
+        elem_exists = self._selenium_condition_waiting(
+            field_visible,
             success_msg='Region field is added',
             timeout_exception_msg=timeout_exception_msg)
 
         try:
             region_field = self.browser.find_element_by_xpath(
-                region_field_xpath)
+                self.REGION_FIELD_XPATH)
             region_field.send_keys(self.linkedin_search.search_geo)
             logger.info('Set search term into region field')
         except Exception as e:
@@ -181,14 +194,20 @@ class LinkedinParserByGeo(BaseLinkedinParser):
         return True
 
     def _click_first_from_dropdown(self):
-        """Click on first element from drop down region menu
-        Wait for search page with
-        region param in url (facetGeoRegion) will be loaded
+        """Wait for region drop down menu is loaded
+        and click on its first element
         """
-        first_region_xpath = '//ul[contains(@class, ' \
-            '"type-ahead-results")]/li[1]'
+        dropdown_loaded = EC.element_to_be_clickable(
+            (By.XPATH, self.FIRST_REGION_XPATH))
+        elem_exists = self._selenium_condition_waiting(
+            dropdown_loaded,
+            success_msg='Region dropdown is loaded',
+            timeout_exception_msg='Timed out waiting for region dropdown')
+        if not elem_exists:
+            return False
+
         try:
-            el = self.browser.find_element_by_xpath(first_region_xpath)
+            el = self.browser.find_element_by_xpath(self.FIRST_REGION_XPATH)
             el.click()
             logger.info('Click on the first element from region dropdown')
         except Exception as e:
@@ -197,6 +216,18 @@ class LinkedinParserByGeo(BaseLinkedinParser):
 
         return True
 
+    def _wait_region_in_url(self):
+        """Wait for search page with
+        region param in url (facetGeoRegion) will be loaded
+        """
+        def region_in_url(browser):
+            return self.REGION_URL_PARAM in browser.current_url
+
+        return self._selenium_condition_waiting(
+            region_in_url,
+            success_msg='Search page with region is loaded',
+            timeout_exception_msg='Timed out waiting for region in url')
+
     def _compose_employees_list_url(self):
         """
         Returns:
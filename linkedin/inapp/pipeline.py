@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Parse and persist stages of employees pages crawl.
+
+Browser thread puts page sources into the pipeline and moves on to the
+next page. One thread parses page sources into items, another one passes
+them to result writer that saves them into db by batches. Stages are
+joined by bounded queues, so browser waits only when parsing or saving
+falls behind.
+"""
+import logging
+import threading
+from Queue import Queue, Empty
+
+from django.db import connection
+
+logger = logging.getLogger('linkedin_parser')
+
+_STOP = object()
+
+
+class PagePipeline(object):
+
+    def __init__(self, parse_page, writer, maxsize=0):
+        """
+        Args:
+            parse_page: function(page_source, page_numb) returns items,
+                None if crawl should be stopped on this page
+            writer: ResultWriter that saves items into db
+        """
+        self.parse_page = parse_page
+        self.writer = writer
+        self.stopped_on_page = None
+        self.error = None
+
+        self._parse_queue = Queue(maxsize)
+        self._save_queue = Queue(maxsize)
+        self._threads = [
+            threading.Thread(target=self._parse_worker, name='page-parse'),
+            threading.Thread(target=self._save_worker, name='page-save'),
+        ]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    @property
+    def is_stopped(self):
+        return self.stopped_on_page is not None or self.error is not None
+
+    def put(self, page_numb, page_source):
+        self._parse_queue.put((page_numb, page_source))
+
+    def close(self):
+        """Wait for all pages are parsed and saved
+
+        Raises:
+            First exception raised by parse or save stage
+        """
+        self._parse_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+    def _parse_worker(self):
+        while True:
+            task = self._parse_queue.get()
+            if task is _STOP:
+                self._save_queue.put(_STOP)
+                return
+
+            page_numb, page_source = task
+            if self.is_stopped:
+                continue
+
+            try:
+                items = self.parse_page(page_source, page_numb)
+            except Exception as e:
+                logger.exception(e)
+                self.error = e
+                continue
+
+            if items is None:
+                self.stopped_on_page = page_numb
+                continue
+
+            self._save_queue.put((page_numb, items))
+
+    def _save_worker(self):
+        try:
+            while True:
+                try:
+                    task = self._save_queue.get(
+                        timeout=self.writer.get_flush_timeout())
+                except Empty:
+                    # No pages for a while, save buffered ones
+                    self._write(self.writer.flush)
+                    continue
+
+                if task is _STOP:
+                    # Pages parsed before crawl is stopped are saved too
+                    self._write(self.writer.close)
+                    return
+
+                page_numb, items = task
+                if self.error is not None:
+                    continue
+
+                self._write(self.writer.add, items, page_numb)
+        finally:
+            # Db connections are per thread, do not leave it open
+            connection.close()
+
+    def _write(self, method, *args):
+        try:
+            method(*args)
+        except Exception as e:
+            logger.exception(e)
+            self.error = e
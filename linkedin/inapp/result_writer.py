@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Write-behind buffer of scraped employees.
+
+Pages are collected in memory and saved by one transaction when enough
+rows are buffered or the oldest page waits too long, so db commits
+much less often than pages are scraped. Buffered rows hold plain
+strings only, so buffer takes memory of rows, not of page trees they
+were extracted from.
+"""
+import time
+import logging
+import threading
+
+from django.conf import settings
+
+from models import LinkedinSearchResult
+
+logger = logging.getLogger('linkedin_parser')
+
+
+class WriterStats(object):
+    """Sum of db writes of result writers, they add their counters
+    when they are closed
+    """
+
+    def __init__(self):
+        self.rows_written = 0
+        self.commits = 0
+        self.flush_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, writer):
+        with self._lock:
+            self.rows_written += writer.rows_written
+            self.commits += writer.commits
+            self.flush_time += writer.flush_time
+
+
+class ResultWriter(object):
+
+    def __init__(self, search, flush_rows=None, flush_interval=None,
+                 stats=None):
+        """
+        Args:
+            flush_rows: rows that are saved at once,
+                RESULT_WRITER_FLUSH_ROWS by default
+            flush_interval: max seconds page waits in buffer,
+                RESULT_WRITER_FLUSH_INTERVAL by default
+            stats: WriterStats counters of writer are added to
+        """
+        if flush_rows is None:
+            flush_rows = settings.RESULT_WRITER_FLUSH_ROWS
+        if flush_interval is None:
+            flush_interval = settings.RESULT_WRITER_FLUSH_INTERVAL
+
+        self.search = search
+        self.stats = stats
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        self._pages = []
+        self._rows_count = 0
+        self._first_added = None
+
+        self.started = time.time()
+        self.rows_written = 0
+        self.commits = 0
+        self.flush_time = 0.0
+
+    def add(self, rows, page_numb):
+        """Buffer rows of the page, flush buffer if it is due
+        """
+        if not self._pages:
+            self._first_added = time.time()
+        self._pages.append((page_numb, rows))
+        self._rows_count += len(rows)
+
+        if self._rows_count >= self.flush_rows or \
+                self.get_flush_timeout() == 0:
+            self.flush()
+
+    def get_flush_timeout(self):
+        """
+        Returns:
+            Seconds until buffer is due to flush, None if buffer is empty
+        """
+        if not self._pages:
+            return None
+        return max(
+            0, self._first_added + self.flush_interval - time.time())
+
+    def flush(self):
+        """Save all buffered pages in one transaction. Pages are dropped
+        from buffer even if saving fails, they stay not scraped in db
+        and are claimed again
+        """
+        if not self._pages:
+            return
+
+        pages, self._pages = self._pages, []
+        rows_count, self._rows_count = self._rows_count, 0
+
+        started = time.time()
+        try:
+            LinkedinSearchResult.save_pages(self.search, pages)
+        finally:
+            self.flush_time += time.time() - started
+
+        self.rows_written += rows_count
+        self.commits += 1
+        logger.info('Saved %d items from %d pages' % (rows_count, len(pages)))
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.log_stats()
+            if self.stats is not None:
+                self.stats.add(self)
+
+    def log_stats(self):
+        elapsed = max(time.time() - self.started, 0.001)
+        logger.info(
+            'Result writer saved %d items in %d commits, %.1f rows/sec, '
+            '%.2f commits/sec, %.3fs in db' % (
+                self.rows_written, self.commits,
+                self.rows_written / elapsed, self.commits / elapsed,
+                self.flush_time))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Push channel of search status changes.
+
+Parser publishes changed search into fanout exchange of celery broker.
+Every web process has one hub that consumes the exchange and copies
+events into queues of open event streams, so idle streams cost one
+queue each and no broker connection or db query.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from Queue import Queue, Empty, Full
+
+from django.conf import settings
+from django.db import transaction
+from kombu import Exchange, Queue as BrokerQueue
+from kombu.mixins import ConsumerMixin
+
+from linkedin.celery import app
+from models import LinkedinSearch
+
+logger = logging.getLogger('linkedin_parser')
+
+search_events_exchange = Exchange(
+    settings.SEARCH_EVENTS_EXCHANGE, type='fanout', durable=False)
+
+
+def publish_search_event(search_id):
+    """Send search to event streams when transaction is committed
+    """
+    def publish():
+        try:
+            search = LinkedinSearch.objects.get(pk=search_id)
+            with app.producer_pool.acquire(block=True) as producer:
+                producer.publish(
+                    search.as_dict(), exchange=search_events_exchange,
+                    declare=[search_events_exchange], serializer='json',
+                    retry=True, retry_policy={
+                        'max_retries': 1, 'interval_start': 0})
+        except Exception as e:
+            # Dashboard polls changes anyway, parser must go on
+            logger.error('Search event is not published: %s' % e)
+
+    transaction.on_commit(publish)
+
+
+def format_event(event, data):
+    """
+    Returns:
+        Text of server-sent event
+    """
+    return 'event: %s\ndata: %s\n\n' % (event, json.dumps(data))
+
+
+class SearchEventsHub(ConsumerMixin):
+    """Consumer of search events shared by all streams of process
+    """
+
+    def __init__(self):
+        self.connection = None
+        self._listeners = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _start(self):
+        # Hub starts in process that serves streams, after gunicorn fork
+        self.connection = app.connection_for_read()
+        self._thread = threading.Thread(
+            target=self.run, name='search-events-hub')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def get_consumers(self, Consumer, channel):
+        queue = BrokerQueue(
+            'search_events.%s.%d.%s' % (
+                socket.gethostname(), os.getpid(), uuid.uuid4().hex),
+            exchange=search_events_exchange, durable=False,
+            exclusive=True, auto_delete=True)
+        return [Consumer(queues=[queue], callbacks=[self.on_message],
+                         accept=['json'], no_ack=True)]
+
+    def on_message(self, body, message):
+        with self._lock:
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener.put_nowait(body)
+            except Full:
+                # Client does not read, it gets changes by polling
+                continue
+
+    def subscribe(self):
+        """
+        Returns:
+            Queue of search events for one stream
+        """
+        listener = Queue(maxsize=settings.SEARCH_EVENTS_QUEUE_SIZE)
+        with self._lock:
+            if self._thread is None:
+                self._start()
+            self._listeners.add(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            self._listeners.discard(listener)
+
+    def iter_stream(self, max_age=None):
+        """Events of searches and heartbeat comments between them, so
+        proxies and closed connections are noticed
+
+        Yields:
+            Chunks of event stream
+        """
+        if max_age is None:
+            max_age = settings.SEARCH_EVENTS_MAX_AGE
+
+        listener = self.subscribe()
+        try:
+            # Client reconnects after stream is closed by max age
+            yield 'retry: %d\n\n' % (settings.SEARCH_EVENTS_RETRY * 1000)
+            closes_at = time.time() + max_age
+            while time.time() < closes_at:
+                try:
+                    search = listener.get(
+                        timeout=settings.SEARCH_EVENTS_HEARTBEAT)
+                except Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield format_event('search', search)
+        finally:
+            self.unsubscribe(listener)
+
+
+search_events_hub = SearchEventsHub()
@@ -1,10 +1,14 @@
 import logging
 
 from celery import task
+from celery.signals import worker_process_shutdown
 
 from parser_linkedin_by_company import LinkedinParserByCompany
 from parser_linkedin_by_geo import LinkedinParserByGeo
-from models import LinkedinSearch
+from browser_pool import browser_pool
+from export import write_export_files, mark_export_building, \
+    unmark_export_building
+from models import LinkedinSearch, STATE_FINISHED
 
 BY_COMPANY_SEARCH_TYPE = 1
 BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE = 2
@@ -12,28 +16,86 @@ BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE = 2
 logger = logging.getLogger('linkedin_parser')
 
 
+@worker_process_shutdown.connect
+def close_browser_sessions(**kwargs):
+    browser_pool.close_all()
+
+
 @task
 def create_linkedin_search(search_term, search_type, search_geo):
-    if int(search_type) == BY_COMPANY_SEARCH_TYPE:
-        parser = LinkedinParserByCompany()
-        parser.create_new_linkedin_search(search_term, search_type)
-    elif int(search_type) == BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE:
-        parser = LinkedinParserByGeo()
-        parser.create_new_linkedin_search(search_term, search_type, search_geo)
+    run_new_search(search_term, search_type, search_geo)
+
 
-    parser.parse()
+def run_new_search(search_term, search_type, search_geo, writer_stats=None):
+    """
+    Args:
+        writer_stats: WriterStats db writes of parser are added to
+    """
+    with browser_pool.lease() as session:
+        if int(search_type) == BY_COMPANY_SEARCH_TYPE:
+            parser = LinkedinParserByCompany(
+                session=session, writer_stats=writer_stats)
+            parser.create_new_linkedin_search(search_term, search_type)
+        elif int(search_type) == BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE:
+            parser = LinkedinParserByGeo(
+                session=session, writer_stats=writer_stats)
+            parser.create_new_linkedin_search(
+                search_term, search_type, search_geo)
+
+        parser.parse()
 
 
 @task
 def update_linkedin_search(search_id):
     try:
         linkedin_search = LinkedinSearch.objects.get(pk=search_id)
-        if linkedin_search.search_type == BY_COMPANY_SEARCH_TYPE:
-            parser = LinkedinParserByCompany()
-        elif linkedin_search.search_type == BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE:
-            parser = LinkedinParserByGeo()
+        with browser_pool.lease() as session:
+            if linkedin_search.search_type == BY_COMPANY_SEARCH_TYPE:
+                parser = LinkedinParserByCompany(session=session)
+            elif (linkedin_search.search_type ==
+                  BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE):
+                parser = LinkedinParserByGeo(session=session)
 
-        parser.update_existing_linkedin_search(linkedin_search.id)
-        parser.parse()
+            parser.update_existing_linkedin_search(linkedin_search.id)
+            parser.parse()
     except LinkedinSearch.DoesNotExist as e:
         logging.error(e)
+
+
+@task
+def build_search_exports(search_id):
+    # Finished search does not change, its files are served by nginx
+    try:
+        linkedin_search = LinkedinSearch.objects.get(pk=search_id)
+    except LinkedinSearch.DoesNotExist as e:
+        logging.error(e)
+        return None
+
+    try:
+        if linkedin_search.status != STATE_FINISHED:
+            return None
+
+        write_export_files(linkedin_search.id)
+        logger.info('Exports of search %d are written' % linkedin_search.id)
+    finally:
+        unmark_export_building(linkedin_search.id)
+
+
+def start_building_exports(search_id):
+    """Queue build of export files unless it is queued already.
+    Search and downloads go on without files if broker is down
+
+    Returns:
+        True if build is queued, False otherwise
+    """
+    if not mark_export_building(search_id):
+        return False
+
+    try:
+        build_search_exports.delay(search_id)
+    except Exception as e:
+        unmark_export_building(search_id)
+        logger.error('Exports of search %d are not queued: %s' % (
+            search_id, e))
+        return False
+    return True
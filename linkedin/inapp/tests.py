@@ -1,3 +1,858 @@
-from django.test import TestCase
+# -*- coding: utf-8 -*-
+import io
+import os
+import re
+import shutil
+import socket
+import tempfile
+import time
+import zipfile
+import threading
+from datetime import timedelta
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from Cookie import SimpleCookie
+from urlparse import urlparse
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings)
+from django.utils import timezone
+from lxml import html
+
+from inapp import extractor
+from inapp.browser_pool import browser_pool
+from inapp.drivers import BROWSER_FAKE
+from inapp.export import get_exporter, get_export_path
+from inapp.models import LinkedinSearch, LinkedinSearchResult, \
+    LinkedinSearchPage, LinkedinUser, STATUS_CHOICES, \
+    STATE_CONNECTION_REFUSED, STATE_FINISHED, STATE_ASKS_PREMIUM, \
+    STATE_IN_PROCESS, STATE_CODE_NOT_VALID, STATE_ERROR, STATE_ASKS_CODE, \
+    PAGE_PENDING, PAGE_CLAIMED, PAGE_DONE
+from inapp.parser_linkedin_base import BaseLinkedinParser
+from inapp.result_writer import WriterStats
+from inapp.tasks import create_linkedin_search, update_linkedin_search, \
+    run_new_search, BY_COMPANY_SEARCH_TYPE, \
+    BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE
+from linkedin.celery import app
+from inapp.fake_site.site import FakeSite, AUTH_COOKIE
+from inapp.http_fetcher import HttpPageFetcher
+from inapp.search_events import SearchEventsHub, format_event
+from inapp import views
+
+USER_AGENT = 'Mozilla/5.0 (parser test)'
+
+# Version of searches is shared by processes through file cache,
+# tests keep it in memory
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'search_changes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'search-changes-test'},
+}
+
+
+class FakeSiteHandler(BaseHTTPRequestHandler):
+    """Serves pages of FakeSite, redirects to the page FakeSite
+    ends on, like linkedin redirects to authwall
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self)
+        cookies = dict(
+            (name, {'name': name, 'value': morsel.value})
+            for name, morsel in SimpleCookie(
+                self.headers.get('Cookie', '')).items())
+        url, page_source = self.server.site.render(
+            FakeSite.BASE_URL.rstrip('/') + self.path, cookies)
+
+        path = urlparse(url).path
+        if path != urlparse(self.path).path:
+            self.send_response(302)
+            self.send_header('Location', path)
+            self.end_headers()
+            return
+
+        body = page_source.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubBrowser(object):
+    """Only calls HttpPageFetcher makes to copy browser session
+    """
+
+    def __init__(self, cookies):
+        self.cookies = cookies
+
+    def execute_script(self, script):
+        return USER_AGENT
+
+    def get_cookies(self):
+        return self.cookies
+
+
+class ExtractTotalResultsTest(SimpleTestCase):
+
+    def _extract(self, header):
+        page_html = html.fromstring(
+            u'<div><h3 class="search-results__total">%s</h3></div>' % header)
+        return extractor.extract_total_results(page_html)
+
+    def test_separators_of_thousands(self):
+        self.assertEqual(self._extract(u'About 1,234 results'), 1234)
+        self.assertEqual(self._extract(u'About 1.234 results'), 1234)
+        self.assertEqual(self._extract(u'About 1\xa0234 results'), 1234)
+        self.assertEqual(self._extract(u'About 1\u202f234 results'), 1234)
+        self.assertEqual(self._extract(u'About 1\u2009234 results'), 1234)
+
+    def test_rounded_count(self):
+        self.assertEqual(self._extract(u'About 1.2K results'), 1200)
+        self.assertEqual(self._extract(u'About 3M results'), 3000000)
+
+    def test_small_count(self):
+        self.assertEqual(self._extract(u'Showing 1 result'), 1)
+
+    def test_no_header(self):
+        self.assertIsNone(extractor.extract_total_results(
+            html.fromstring('<div><h3>Results</h3></div>')))
+
+
+class HttpPageFetcherTest(SimpleTestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), FakeSiteHandler)
+        self.server.site = FakeSite(total_results=25)
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.base_url = 'http://127.0.0.1:%d' % self.server.server_port
+        self.people_url = self.base_url + \
+            '/search/results/people/?facetCurrentCompany=%5B%221%22%5D'
+
+    def _create_fetcher(self, cookies):
+        fetcher = HttpPageFetcher(StubBrowser(cookies))
+        self.addCleanup(fetcher.close)
+        return fetcher
+
+    def test_session_of_browser_is_sent(self):
+        fetcher = self._create_fetcher([{
+            'name': AUTH_COOKIE, 'value': 'session', 'path': '/',
+            'domain': '127.0.0.1'}])
+        page_source, url = fetcher.fetch(self.people_url + '&page=3')
+
+        self.assertEqual(url, self.people_url + '&page=3')
+        request = self.server.requests[-1]
+        self.assertEqual(request.headers['User-Agent'], USER_AGENT)
+        self.assertIn('%s=session' % AUTH_COOKIE, request.headers['Cookie'])
+
+        probe = extractor.probe_page_state(html.fromstring(page_source), url)
+        self.assertEqual(probe['cards'], 5)
+        self.assertEqual(probe['login_wall'], 0)
+
+    def test_redirect_to_login_is_detected(self):
+        fetcher = self._create_fetcher([])
+        page_source, url = fetcher.fetch(self.people_url + '&page=1')
+
+        self.assertEqual(urlparse(url).path, '/authwall')
+        probe = extractor.probe_page_state(html.fromstring(page_source), url)
+        self.assertEqual(probe['cards'], 0)
+        self.assertTrue(probe['login_wall'])
+
+    def test_page_after_last_has_no_results(self):
+        fetcher = self._create_fetcher([{
+            'name': AUTH_COOKIE, 'value': 'session', 'path': '/',
+            'domain': '127.0.0.1'}])
+        page_source, url = fetcher.fetch(self.people_url + '&page=4')
+
+        probe = extractor.probe_page_state(html.fromstring(page_source), url)
+        self.assertEqual(probe['no_results'], 1)
+
+    def test_failed_fetch_returns_no_page(self):
+        # Port of closed socket refuses connections
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        url = 'http://127.0.0.1:%d/search/results/people/?page=1' % \
+            sock.getsockname()[1]
+        sock.close()
+
+        fetcher = self._create_fetcher([])
+        self.assertEqual(fetcher.fetch(url), (None, url))
+
+
+class ExportersTest(TestCase):
+
+    def setUp(self):
+        self.search = LinkedinSearch.objects.create(search_term='test')
+        LinkedinSearchResult.objects.bulk_create([
+            LinkedinSearchResult(
+                search=self.search, page_number=1, position=position,
+                first_name=u'=HYPERLINK("http://evil")', last_name=u'Ёж',
+                title='http://example.com', location='Kyiv',
+                current_company='Company')
+            for position in range(1, 4)])
+
+    def _export(self, export_format):
+        exporter = get_exporter(export_format)
+        if exporter is None:
+            self.skipTest('%s is not available' % export_format)
+        return ''.join(exporter.iter_chunks(self.search.id))
+
+    def test_xlsx_writes_text_as_is(self):
+        data = self._export('xlsx')
+
+        workbook = zipfile.ZipFile(io.BytesIO(data))
+        sheet = workbook.read('xl/worksheets/sheet1.xml')
+        self.assertNotIn('<f>', sheet)
+        self.assertIn('=HYPERLINK', sheet)
+        self.assertNotIn('xl/worksheets/_rels/sheet1.xml.rels',
+                         workbook.namelist())
+
+    def test_parquet_has_all_rows(self):
+        data = self._export('parquet')
+
+        import pyarrow
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(pyarrow.BufferReader(data))
+        columns = table.to_pydict()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(columns['last_name'], [u'Ёж'] * 3)
+
+
+class SearchEtaTest(SimpleTestCase):
+
+    def test_eta_of_restarted_search(self):
+        # Search waited for days before it was restarted
+        now = timezone.now()
+        search = LinkedinSearch(
+            status=STATE_IN_PROCESS, date_created=now - timedelta(days=3),
+            total_pages=20, scraped_pages=12, scraping_started_pages=10,
+            scraping_started_at=now - timedelta(seconds=100))
+
+        # 2 pages in 100 seconds, 8 pages left
+        self.assertAlmostEqual(search.get_eta(), 400, delta=2)
+
+    def test_no_eta_before_page_is_scraped(self):
+        search = LinkedinSearch(
+            status=STATE_IN_PROCESS, total_pages=20, scraped_pages=10,
+            scraping_started_pages=10, scraping_started_at=timezone.now())
+
+        self.assertIsNone(search.get_eta())
+
+
+# Version of searches is set when transaction is committed
+@override_settings(CACHES=TEST_CACHES)
+class SearchesPollTest(TransactionTestCase):
+
+    def setUp(self):
+        caches['search_changes'].clear()
+        self.searches = [
+            LinkedinSearch.objects.create(search_term='search %d' % i)
+            for i in range(3)]
+        # Searches were changed long before the first poll
+        LinkedinSearch.objects.update(
+            updated_at=timezone.now() - timedelta(hours=1))
+        self.url = reverse('inapp:get-companies-list')
+
+    def _poll(self, previous=None):
+        params, headers = {}, {}
+        if previous is not None:
+            params['since'] = previous.json()['since']
+            headers['HTTP_IF_NONE_MATCH'] = previous['ETag']
+        return self.client.get(self.url, params, **headers)
+
+    def test_unchanged_searches_are_not_sent(self):
+        response = self._poll()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['content']), 3)
+
+        self.assertEqual(self._poll(response).status_code, 304)
+
+    def test_only_changed_search_is_sent(self):
+        response = self._poll()
+        search = self.searches[1]
+        search.scraped_pages = 1
+        search.save()
+
+        response = self._poll(response)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['delta'])
+        self.assertEqual(
+            [s['id'] for s in response.json()['content']], [search.id])
+
+    def test_deleted_search_sends_whole_page(self):
+        response = self._poll()
+        self.searches[0].delete()
+
+        response = self._poll(response)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['delta'])
+        self.assertEqual(
+            sorted(s['id'] for s in response.json()['content']),
+            sorted(s.id for s in self.searches[1:]))
+
+
+# Plan lines of full table scans and sorts that are not served by index
+class StubEventsHub(SearchEventsHub):
+    """Hub that is not connected to broker, test sends events itself
+    """
+
+    def _start(self):
+        self._thread = threading.current_thread()
+
+
+@override_settings(
+    SEARCH_EVENTS_HEARTBEAT=0.01, SEARCH_EVENTS_RETRY=5,
+    SEARCH_EVENTS_QUEUE_SIZE=2)
+class SearchEventsTest(SimpleTestCase):
+
+    def setUp(self):
+        self.hub = StubEventsHub()
+
+    def test_stream_sends_heartbeat_and_events(self):
+        stream = self.hub.iter_stream(max_age=60)
+        self.assertEqual(next(stream), 'retry: 5000\n\n')
+        self.assertEqual(next(stream), ': heartbeat\n\n')
+
+        self.hub.on_message({'id': 1, 'status': 'Finished'}, None)
+        self.assertEqual(next(stream), format_event(
+            'search', {'id': 1, 'status': 'Finished'}))
+        stream.close()
+
+    def test_full_listener_does_not_block_others(self):
+        slow = self.hub.subscribe()
+        fast = self.hub.subscribe()
+
+        for i in range(3):
+            self.hub.on_message({'id': i}, None)
+            self.assertEqual(fast.get_nowait(), {'id': i})
+
+        # Third event is dropped for listener that does not read
+        self.assertEqual(slow.get_nowait(), {'id': 0})
+        self.assertEqual(slow.get_nowait(), {'id': 1})
+        self.assertTrue(slow.empty())
+
+    def test_closed_stream_unsubscribes(self):
+        stream = self.hub.iter_stream(max_age=60)
+        next(stream)
+        self.assertEqual(len(self.hub._listeners), 1)
+
+        stream.close()
+        self.assertEqual(len(self.hub._listeners), 0)
+
+    def test_stream_is_closed_by_max_age(self):
+        self.assertEqual(
+            list(self.hub.iter_stream(max_age=0)), ['retry: 5000\n\n'])
+        self.assertEqual(len(self.hub._listeners), 0)
+
+    def test_view_streams_events_of_hub(self):
+        self.addCleanup(
+            setattr, views, 'search_events_hub', views.search_events_hub)
+        views.search_events_hub = self.hub
+
+        response = self.client.get(reverse('inapp:search-events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), 'retry: 5000\n\n')
+        self.hub.on_message({'id': 2}, None)
+        self.assertEqual(next(stream), format_event('search', {'id': 2}))
+
+        response.close()
+        self.assertEqual(len(self.hub._listeners), 0)
+
+
+BAD_PLAN_PATTERNS = {
+    'postgresql': [
+        re.compile(r'Seq Scan on inapp_'),
+        re.compile(r'\bSort\b'),
+    ],
+    'sqlite': [
+        re.compile(r'SCAN (TABLE )?inapp_\w+$'),
+        re.compile(r'USE TEMP B-TREE'),
+    ],
+}
+
+
+# Default tables are small so suite stays fast, plans of production
+# sized tables are checked on postgres, e.g. with 2000000 results
+QUERY_PLANS_SEED_RESULTS = int(
+    os.environ.get('QUERY_PLANS_SEED_RESULTS', 5000))
+QUERY_PLANS_SEED_BATCH = 10000
+
+
+class QueryPlansTest(TestCase):
+    """Queries of search views and commands are served by indexes
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.large_seed = QUERY_PLANS_SEED_RESULTS > 5000
+        statuses = [status for status, name in STATUS_CHOICES]
+        LinkedinSearch.objects.bulk_create([
+            LinkedinSearch(search_term='search %d' % i,
+                           status=statuses[i % len(statuses)])
+            for i in range(max(200, QUERY_PLANS_SEED_RESULTS // 1000))])
+        search_ids = list(
+            LinkedinSearch.objects.values_list('id', flat=True))
+        for start in range(
+                0, QUERY_PLANS_SEED_RESULTS, QUERY_PLANS_SEED_BATCH):
+            end = min(start + QUERY_PLANS_SEED_BATCH, QUERY_PLANS_SEED_RESULTS)
+            LinkedinSearchResult.objects.bulk_create([
+                LinkedinSearchResult(
+                    search_id=search_ids[i % len(search_ids)],
+                    page_number=i // len(search_ids), position=1,
+                    first_name='Employee', last_name=str(i),
+                    title='Engineer', location='Kyiv, Ukraine',
+                    current_company='Company')
+                for i in range(start, end)])
+        cls.search_id = search_ids[-1]
+
+    def setUp(self):
+        if connection.vendor not in BAD_PLAN_PATTERNS:
+            self.skipTest(
+                'Query plans of %s are not supported' % connection.vendor)
+
+        # Planner chooses indexes by statistics of tables, postgres
+        # scans small tables anyway unless it is told not to
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE inapp_linkedinsearch')
+                cursor.execute('ANALYZE inapp_linkedinsearchresult')
+                if not self.large_seed:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            else:
+                cursor.execute('ANALYZE')
+
+    def _explain(self, qs):
+        """
+        Returns:
+            Lines of query plan
+        """
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN ' + sql, params)
+                return [row[0] for row in cursor.fetchall()]
+
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertServedByIndex(self, qs):
+        plan = self._explain(qs)
+        for line in plan:
+            for pattern in BAD_PLAN_PATTERNS[connection.vendor]:
+                self.assertIsNone(
+                    pattern.search(line),
+                    'Query is not served by index:\n%s' % '\n'.join(plan))
+
+    def test_employees_of_search(self):
+        # SearchDetailsView and csv export
+        self.assertServedByIndex(LinkedinSearchResult.objects.filter(
+            search_id=self.search_id).order_by('id')[:settings.ROWS_ON_PAGE])
+
+    def test_page_of_searches(self):
+        # LinkedinSearchView and get_companies_list
+        self.assertServedByIndex(LinkedinSearch.objects.all().order_by(
+            '-date_created')[:settings.ROWS_ON_PAGE])
+
+    def test_changed_searches(self):
+        # get_companies_list with since
+        self.assertServedByIndex(LinkedinSearch.objects.filter(
+            updated_at__gt=timezone.now() - timedelta(
+                seconds=settings.SEARCH_CHANGES_OVERLAP)).order_by(
+                    'updated_at'))
+
+    def test_searches_of_status(self):
+        # restart_task_with_connection_refused
+        self.assertServedByIndex(LinkedinSearch.objects.filter(
+            status=STATE_CONNECTION_REFUSED)[:1])
+
+
+@override_settings(SEARCH_PAGE_CLAIM_TIMEOUT=60)
+class SearchPagesTest(TestCase):
+    """Workers of one search share its pages
+    """
+
+    def setUp(self):
+        self.search = LinkedinSearch.objects.create(search_term='test')
+
+    def _get_statuses(self):
+        return dict(LinkedinSearchPage.objects.filter(
+            search=self.search).values_list('page_number', 'status'))
+
+    def test_workers_claim_disjoint_ranges(self):
+        self.assertEqual(
+            LinkedinSearchPage.claim(self.search, 'first', 3), [1, 2, 3])
+        self.assertEqual(
+            LinkedinSearchPage.claim(self.search, 'second', 3), [4, 5, 6])
+        self.assertEqual(
+            set(LinkedinSearchPage.objects.filter(
+                search=self.search, page_number__lte=3).values_list(
+                    'worker', flat=True)), {'first'})
+
+    def test_claims_stop_at_the_end_of_search(self):
+        self.search.set_no_results_page(3)
+
+        self.assertEqual(
+            LinkedinSearchPage.claim(self.search, 'first', 5), [1, 2])
+        self.assertEqual(
+            LinkedinSearchPage.claim(self.search, 'second', 5), [])
+
+    def test_expired_claim_is_reclaimed(self):
+        LinkedinSearchPage.claim(self.search, 'first', 3)
+        self.assertFalse(LinkedinSearchPage.has_free_pages(self.search))
+
+        LinkedinSearchPage.objects.filter(search=self.search).update(
+            claimed_at=timezone.now() - timedelta(seconds=61))
+
+        self.assertTrue(LinkedinSearchPage.has_free_pages(self.search))
+        self.assertEqual(
+            LinkedinSearchPage.claim(self.search, 'second', 3), [1, 2, 3])
+
+    def test_live_claim_is_not_reclaimed(self):
+        LinkedinSearchPage.claim(self.search, 'first', 3)
+        LinkedinSearchPage.objects.filter(search=self.search).update(
+            claimed_at=timezone.now() - timedelta(seconds=59))
+
+        self.assertEqual(
+            LinkedinSearchPage.claim(self.search, 'second', 3), [4, 5, 6])
+
+    def test_release_all_returns_pages(self):
+        LinkedinSearchPage.claim(self.search, 'first', 2)
+        LinkedinSearchPage.claim(self.search, 'second', 2)
+        LinkedinSearchPage.mark_done(self.search, [1])
+
+        LinkedinSearchPage.release_all(self.search)
+
+        self.assertEqual(self._get_statuses(), {
+            1: PAGE_DONE, 2: PAGE_PENDING, 3: PAGE_PENDING, 4: PAGE_PENDING})
+        self.assertFalse(LinkedinSearchPage.is_claimed_by_others(
+            self.search, 'third'))
+        self.assertEqual(
+            LinkedinSearchPage.claim(self.search, 'third', 5), [2, 3, 4])
+
+    def test_release_returns_pages_of_worker(self):
+        LinkedinSearchPage.claim(self.search, 'first', 2)
+        LinkedinSearchPage.claim(self.search, 'second', 2)
+
+        LinkedinSearchPage.release(self.search, 'first')
+
+        self.assertEqual(self._get_statuses(), {
+            1: PAGE_PENDING, 2: PAGE_PENDING,
+            3: PAGE_CLAIMED, 4: PAGE_CLAIMED})
+        self.assertTrue(LinkedinSearchPage.is_claimed_by_others(
+            self.search, 'first'))
+
+    def test_search_is_complete_when_all_pages_are_done(self):
+        LinkedinSearchPage.claim(self.search, 'first', 2)
+        LinkedinSearchPage.claim(self.search, 'second', 2)
+        LinkedinSearchPage.mark_done(self.search, [1, 2])
+        self.assertFalse(LinkedinSearchPage.is_search_complete(self.search))
+
+        # End of search is found by the second worker
+        self.search.set_no_results_page(4)
+        self.assertFalse(LinkedinSearchPage.is_search_complete(self.search))
+
+        LinkedinSearchPage.mark_done(self.search, [3])
+        self.assertTrue(LinkedinSearchPage.is_search_complete(self.search))
+
+    def test_pages_are_counted_once(self):
+        LinkedinSearchPage.claim(self.search, 'first', 2)
+        LinkedinSearchPage.mark_done(self.search, [1, 2])
+        LinkedinSearchPage.mark_done(self.search, [2])
+
+        self.search.refresh_from_db()
+        self.assertEqual(self.search.scraped_pages, 2)
+
+    def _get_results(self):
+        return list(LinkedinSearchResult.objects.filter(
+            search=self.search).order_by(
+                'page_number', 'position').values_list(
+                    'page_number', 'position', 'first_name'))
+
+    def test_saving_page_again_replaces_its_rows(self):
+        LinkedinSearchPage.claim(self.search, 'first', 2)
+        rows = [('Name%d Last' % i, 'Title', 'Location', 'Company')
+                for i in range(3)]
+
+        LinkedinSearchResult.save_pages(self.search, [(1, rows), (2, rows)])
+        LinkedinSearchResult.save_pages(self.search, [(1, rows)])
+        self.assertEqual(self._get_results(), [
+            (1, 1, 'Name0'), (1, 2, 'Name1'), (1, 3, 'Name2'),
+            (2, 1, 'Name0'), (2, 2, 'Name1'), (2, 3, 'Name2')])
+
+        # Page has less employees when it is parsed again
+        LinkedinSearchResult.save_pages(self.search, [(2, rows[:1])])
+        self.assertEqual(self._get_results(), [
+            (1, 1, 'Name0'), (1, 2, 'Name1'), (1, 3, 'Name2'),
+            (2, 1, 'Name0')])
+
+        self.search.refresh_from_db()
+        self.assertEqual(self.search.scraped_pages, 2)
+        self.assertEqual(self.search.last_scraped_page, 2)
+
+
+class StubSession(object):
+    browser = None
+
+
+class WorkerStatusTest(TestCase):
+    """Failure of one worker is not lost while others scrape the search
+    """
+
+    def setUp(self):
+        self.search = LinkedinSearch.objects.create(
+            search_term='test', status=STATE_IN_PROCESS)
+        self.parser = BaseLinkedinParser(session=StubSession())
+        self.parser.linkedin_search = self.search
+        LinkedinSearchPage.claim(self.search, 'other', 2)
+
+    def test_status_is_kept_as_worker_error(self):
+        self.assertFalse(
+            self.parser._update_search_status(STATE_CODE_NOT_VALID))
+
+        self.search.refresh_from_db()
+        self.assertEqual(self.search.status, STATE_IN_PROCESS)
+        self.assertEqual(self.search.worker_error_status, STATE_CODE_NOT_VALID)
+        self.assertIn('worker_error', self.search.as_dict())
+
+    def test_last_worker_reports_error(self):
+        self.search.set_worker_error(STATE_ERROR)
+        self.assertIsNone(self.parser._get_worker_error())
+
+        # Failed worker has returned its pages
+        LinkedinSearchPage.release(self.search, 'other')
+        self.assertEqual(self.parser._get_worker_error(), STATE_ERROR)
+
+    def test_restart_clears_worker_error(self):
+        self.search.set_worker_error(STATE_ERROR)
+        self.search.start_scraping()
+
+        self.search.refresh_from_db()
+        self.assertIsNone(self.search.worker_error_status)
+
+
+# Pages of search are saved by threads of parser pipeline, every thread
+# has its own connection and sees only committed rows
+@override_settings(
+    CACHES=TEST_CACHES,
+    LINKEDIN_BROWSER=BROWSER_FAKE,
+    LINKEDIN_FETCH_BACKEND='browser',
+    SEARCH_SHARD_WORKERS=1)
+class ParserFlowTest(TransactionTestCase):
+    """Parser goes through login, search and employees pages
+    of fake site
+    """
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db(
+                connection.settings_dict['NAME']):
+            self.skipTest('In-memory database is not shared by threads')
+
+        LinkedinUser.objects.create(
+            email='parser-test@example.com', password='parser-test')
+
+        exports_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, exports_dir, ignore_errors=True)
+        exports_settings = override_settings(EXPORTS_DIR=exports_dir)
+        exports_settings.enable()
+        self.addCleanup(exports_settings.disable)
+
+        # Exports of finished search are built in test process
+        always_eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', always_eager)
+
+        # Sessions of other browser and site must not be reused
+        browser_pool.close_all()
+        self.addCleanup(browser_pool.close_all)
+
+    def _run_search(self, search_type=BY_COMPANY_SEARCH_TYPE, tabs=1,
+                    **site_options):
+        """
+        Returns:
+            Search created by parser
+        """
+        browser_options = dict(settings.LINKEDIN_BROWSER_OPTIONS)
+        browser_options[BROWSER_FAKE] = dict(site_options, latency=0)
+        with override_settings(LINKEDIN_BROWSER_OPTIONS=browser_options,
+                               LINKEDIN_PARSER_TABS=tabs):
+            create_linkedin_search('Test company', search_type, 'Kyiv')
+        return LinkedinSearch.objects.get()
+
+    def assertSearchResults(self, search, status, pages, results):
+        self.assertEqual(search.status, status)
+        self.assertEqual(search.scraped_pages, pages)
+        self.assertEqual(search.linkedinsearchresult_set.count(), results)
+
+    def test_search_by_company_is_finished(self):
+        search = self._run_search(total_results=30)
+
+        self.assertSearchResults(search, STATE_FINISHED, 3, 30)
+        self.assertIsNotNone(search.scraping_started_at)
+        self.assertTrue(os.path.exists(get_export_path(search.id, 'csv')))
+
+    def test_search_by_geo_is_finished(self):
+        search = self._run_search(
+            search_type=BY_GEO_FOR_SUPERVISORS_SEARCH_TYPE, total_results=25)
+
+        self.assertEqual(search.search_geo, 'Kyiv')
+        self.assertSearchResults(search, STATE_FINISHED, 3, 25)
+
+    def test_paywall_stops_search(self):
+        search = self._run_search(total_results=50, paywall_page=3)
+
+        self.assertSearchResults(search, STATE_ASKS_PREMIUM, 2, 20)
+        self.assertFalse(os.path.exists(get_export_path(search.id, 'csv')))
+
+    def test_search_in_tabs_is_finished(self):
+        search = self._run_search(tabs=3, total_results=45)
+
+        self.assertSearchResults(search, STATE_FINISHED, 5, 45)
+
+    def test_paywall_stops_search_in_tabs(self):
+        search = self._run_search(tabs=3, total_results=50, paywall_page=3)
+
+        self.assertSearchResults(search, STATE_ASKS_PREMIUM, 2, 20)
+
+    def test_db_writes_are_counted(self):
+        browser_options = dict(settings.LINKEDIN_BROWSER_OPTIONS)
+        browser_options[BROWSER_FAKE] = {'total_results': 30, 'latency': 0}
+        stats = WriterStats()
+        with override_settings(LINKEDIN_BROWSER_OPTIONS=browser_options):
+            run_new_search(
+                'Test company', BY_COMPANY_SEARCH_TYPE, 'Kyiv',
+                writer_stats=stats)
+
+        self.assertEqual(stats.rows_written, 30)
+        self.assertGreater(stats.commits, 0)
+
+    def _run_search_asking_code(self, code):
+        """User saves code when dashboard shows that linkedin asks it
+
+        Returns:
+            Search created by parser and statuses it went through
+        """
+        statuses = []
+
+        def save_code():
+            try:
+                deadline = time.time() + 10
+                while time.time() < deadline:
+                    search = LinkedinSearch.objects.first()
+                    if search is not None:
+                        if not statuses or statuses[-1] != search.status:
+                            statuses.append(search.status)
+                        if search.status == STATE_ASKS_CODE:
+                            LinkedinUser.objects.update(
+                                verification_code=code)
+                            return
+                    time.sleep(0.01)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=save_code)
+        thread.start()
+        try:
+            search = self._run_search(
+                total_results=20, verification_code='123456')
+        finally:
+            thread.join()
+        return search, statuses
+
+    @override_settings(
+        LINKEDIN_PAGE_TIMEOUT_LAODING=0.5,
+        VERIFICATION_CODE_POLL_INTERVAL=0.01,
+        VERIFICATION_CODE_MAX_WAIT=5)
+    def test_search_asking_code_is_finished(self):
+        search, statuses = self._run_search_asking_code('123456')
+
+        self.assertIn(STATE_ASKS_CODE, statuses)
+        self.assertSearchResults(search, STATE_FINISHED, 2, 20)
+
+    @override_settings(
+        LINKEDIN_PAGE_TIMEOUT_LAODING=0.5,
+        VERIFICATION_CODE_POLL_INTERVAL=0.01,
+        VERIFICATION_CODE_MAX_WAIT=5)
+    def test_wrong_code_is_not_valid(self):
+        search, statuses = self._run_search_asking_code('654321')
+
+        self.assertIn(STATE_ASKS_CODE, statuses)
+        self.assertSearchResults(search, STATE_CODE_NOT_VALID, 0, 0)
+
+    def assertPagesDone(self, search):
+        self.assertEqual(
+            set(search.pages.filter(
+                page_number__lt=search.no_results_page).values_list(
+                    'status', flat=True)), {PAGE_DONE})
+        self.assertEqual(
+            search.linkedinsearchresult_set.values(
+                'page_number', 'position').distinct().count(),
+            search.linkedinsearchresult_set.count())
+
+    @override_settings(SEARCH_SHARD_WORKERS=2, SEARCH_SHARD_PAGES=2)
+    def test_search_of_two_workers_is_finished(self):
+        # The second worker is started by the first one, eager task
+        # runs before the first worker claims pages
+        search = self._run_search(total_results=50)
+
+        self.assertSearchResults(search, STATE_FINISHED, 5, 50)
+        self.assertPagesDone(search)
+
+    @override_settings(SEARCH_SHARD_PAGES=1)
+    def test_workers_scrape_search_at_the_same_time(self):
+        browser_options = dict(settings.LINKEDIN_BROWSER_OPTIONS)
+        browser_options[BROWSER_FAKE] = {
+            'total_results': 80, 'latency': 0.02}
+        errors = []
+
+        def run(target, *args):
+            try:
+                target(*args)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        def join_search():
+            # Worker joins when the first one has composed url of pages
+            deadline = time.time() + 10
+            while time.time() < deadline:
+                search = LinkedinSearch.objects.filter(
+                    employees_list_url__isnull=False).first()
+                if search is not None:
+                    update_linkedin_search(search.id)
+                    return
+                time.sleep(0.01)
+
+        with override_settings(LINKEDIN_BROWSER_OPTIONS=browser_options):
+            threads = [
+                threading.Thread(target=run, args=(
+                    create_linkedin_search, 'Test company',
+                    BY_COMPANY_SEARCH_TYPE, 'Kyiv')),
+                threading.Thread(target=run, args=(join_search,))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        search = LinkedinSearch.objects.get()
+        self.assertSearchResults(search, STATE_FINISHED, 8, 80)
+        self.assertPagesDone(search)
@@ -15,4 +15,6 @@ urlpatterns = [
         views.get_linkedin_employees_csv, name='get-employees'),
     url(r'^get_companies_list/$',
         views.get_companies_list, name='get-companies-list'),
+    url(r'^search_events/$',
+        views.get_search_events, name='search-events'),
 ]
@@ -1,7 +1,9 @@
 # -*- coding: UTF-8 -*-
-import csv
+import os
+from datetime import timedelta
 
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, \
+    StreamingHttpResponse
 from django.views.generic.base import View
 from django.views.generic.edit import FormView
 from django.views.generic import ListView
@@ -13,9 +15,16 @@ from django.http.response import JsonResponse
 from django.contrib import messages
 from django.conf import settings
 from django.core.management import call_command
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from inapp.models import LinkedinSearch, LinkedinSearchResult
-from inapp.tasks import create_linkedin_search
+from inapp.models import LinkedinSearch, LinkedinSearchResult, \
+    STATE_FINISHED, get_searches_version, get_searches_deleted_at
+from inapp.tasks import create_linkedin_search, start_building_exports
+from inapp.export import get_exporter, get_export_path, get_export_url
+from inapp.search_events import search_events_hub
 
 
 class LoginFormView(FormView):
@@ -92,50 +101,110 @@ def restart_task(request, task_nmb):
         {'status': 'success', 'msg': 'Task has been restarted'})
 
 
+def get_export_file_response(search, exporter):
+    """
+    Returns:
+        Response that hands export file of finished search over to nginx,
+        None if file of the format is not written
+    """
+    if exporter.stored_format is None:
+        return None
+    if not os.path.exists(get_export_path(search.id, exporter.stored_format)):
+        start_building_exports(search.id)
+        return None
+
+    # Nginx sends the file, gunzips it for clients without gzip
+    response = HttpResponse(content_type=exporter.content_type)
+    response['X-Accel-Redirect'] = get_export_url(search.id, exporter)
+    return response
+
+
 def get_linkedin_employees_csv(request, pk):
     try:
         s = LinkedinSearch.objects.get(pk=pk)
     except Exception:
         return HttpResponse('Linkedin search do not exists')
 
-    response = HttpResponse(content_type='text/csv')
+    exporter = get_exporter(request.GET.get('format', 'csv'))
+    if exporter is None:
+        return HttpResponse('Export format is not supported')
+
+    response = None
+    if s.status == STATE_FINISHED and settings.EXPORTS_X_ACCEL_REDIRECT:
+        response = get_export_file_response(s, exporter)
+
+    if response is None:
+        # Rows are read and sent by chunks, whatever the count of employees
+        response = StreamingHttpResponse(
+            exporter.iter_chunks(s.id), content_type=exporter.content_type)
     response['Content-Disposition'] = \
-        'attachment; filename="%s_employees.csv"' % s.search_term
-
-    qs = LinkedinSearchResult.objects.filter(search_id=s.id).order_by('id')
-
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID SEARCH RESULT', 'FIRST NAME', 'LAST NAME', 'TITLE', 'LOCATION'])
-    for row in qs:
-        first_name = row.first_name.encode(
-            'utf-8').replace(';', '.') if row.first_name else None
-        last_name = row.last_name.encode(
-            'utf-8').replace(';', '.') if row.last_name else None
-        title = row.title.encode(
-            'utf-8').replace(';', '.') if row.title else None
-        location = row.location.encode(
-            'utf-8').replace(';', '.') if row.location else None
-        current_company = row.current_company.encode(
-            'utf-8').replace(';', '.') if row.current_company else None
-        writer.writerow([
-            row.id, first_name, last_name, title, location, current_company])
+        'attachment; filename="%s_employees.%s"' % (
+            s.search_term, exporter.extension)
 
     return response
 
 
+def get_searches_etag(request):
+    return get_searches_version()[0]
+
+
+def get_searches_last_modified(request):
+    return get_searches_version()[1]
+
+
+# Polls of unchanged searches get 304 before the view makes any query,
+# browser must revalidate every poll
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=get_searches_etag,
+           last_modified_func=get_searches_last_modified)
 def get_companies_list(request):
+    """Searches of the page, only searches changed after since date
+    if it is given
+
+    Returns:
+        Json with searches and since date of the next poll
+    """
     page = request.GET.get('page')
     page = int(page) if page else 1
-    start = 0
-    if page > 1:
-        start = page*settings.ROWS_ON_PAGE - settings.ROWS_ON_PAGE
-    end = page*settings.ROWS_ON_PAGE
-    qs = LinkedinSearch.objects.all().order_by(
-            '-date_created')[start:end]
+    try:
+        since = parse_datetime(request.GET.get('since') or '')
+    except ValueError:
+        since = None
+
+    next_since = timezone.now() - timedelta(
+        seconds=settings.SEARCH_CHANGES_OVERLAP)
+    deleted_at = get_searches_deleted_at()
+    if since is not None and deleted_at is not None and deleted_at > since:
+        # Deleted searches are not among changed ones, page is sent whole
+        since = None
+    if since is not None:
+        # Order of index, client puts changed searches in place by id
+        qs = LinkedinSearch.objects.filter(
+            updated_at__gt=since).order_by('updated_at')
+    else:
+        start = 0
+        if page > 1:
+            start = page*settings.ROWS_ON_PAGE - settings.ROWS_ON_PAGE
+        end = page*settings.ROWS_ON_PAGE
+        qs = LinkedinSearch.objects.all().order_by(
+                '-date_created')[start:end]
 
     result = []
     for line in qs:
         result.append(line.as_dict())
 
-    return JsonResponse({'status': 'ok', 'content': result})
+    return JsonResponse({
+        'status': 'ok', 'content': result, 'delta': since is not None,
+        'since': next_since.isoformat()})
+
+
+def get_search_events(request):
+    """Event stream of changed searches. Stream stays open, gunicorn
+    serves it by gevent worker
+    """
+    response = StreamingHttpResponse(
+        search_events_hub.iter_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Nginx sends every event at once instead of buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -17,6 +17,13 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
 
+# Gzipped exports of finished searches. Nginx serves them from internal
+# EXPORTS_URL location (see conf/nginx) when X-Accel-Redirect is on,
+# turn it off when app is not behind that nginx
+EXPORTS_DIR = os.path.join(BASE_DIR, 'exports')
+EXPORTS_URL = '/protected-exports/'
+EXPORTS_X_ACCEL_REDIRECT = True
+
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 LINKEDIN_PAGE_TIMEOUT_LAODING = 60
@@ -25,6 +32,118 @@ ROWS_ON_PAGE = 10
 
 MAX_REPEAT_LINKEDIN_REQUEST = 3
 
+# Linkedin shows 10 employees per page and no more than 100 pages
+LINKEDIN_RESULTS_PER_PAGE = 10
+LINKEDIN_MAX_PAGES = 100
+
+# Interval in seconds of polling employees page state
+PAGE_STATE_POLL_INTERVAL = 0.5
+
+# Employees page is settled when list of employees is not changed during
+# quiet period in seconds. Page is scrolled by step in pixels meanwhile
+PAGE_SETTLE_QUIET_PERIOD = 1.5
+PAGE_SCROLL_STEP = 500
+
+# Number of workers scraping pages of one search, every worker
+# claims range of pages and releases claimed pages after timeout
+SEARCH_SHARD_WORKERS = 1
+SEARCH_SHARD_PAGES = 5
+SEARCH_PAGE_CLAIM_TIMEOUT = 60 * 30
+
+# Backend loading employees pages: 'browser' renders them in selenium,
+# 'http' downloads them with cookies of the selenium session
+LINKEDIN_FETCH_BACKEND = 'browser'
+
+# Number of tabs in one browser session loading
+# employees pages at the same time
+LINKEDIN_PARSER_TABS = 1
+
+# Max number of employees pages waiting in every stage of
+# parse and save pipeline
+PIPELINE_QUEUE_SIZE = 3
+
+# Scraped employees are saved into db by one transaction when this
+# many rows are buffered or the oldest buffered page waits this many
+# seconds, see inapp/result_writer.py
+RESULT_WRITER_FLUSH_ROWS = 100
+RESULT_WRITER_FLUSH_INTERVAL = 5
+
+# Employees read from db by one query of streaming export
+EXPORT_CHUNK_SIZE = 2000
+
+# Seconds export files of one search are built by one task, after that
+# download of missing file queues build again
+EXPORT_BUILD_TIMEOUT = 60 * 30
+
+# Version of searches list is kept in cache shared by gunicorn and celery
+# processes, so polls of unchanged list get 304 without db query.
+# Searches changed this many seconds before previous poll are sent again,
+# they could be saved by transaction not committed at that time
+SEARCH_CHANGES_CACHE = 'search_changes'
+SEARCH_CHANGES_OVERLAP = 10
+
+# Status changes of searches are pushed to dashboards by event stream,
+# see inapp/search_events.py. Stream sends heartbeat comment after this
+# many idle seconds and is closed after max age, client reconnects after
+# retry seconds. Streams stay open, so gunicorn runs gevent workers
+SEARCH_EVENTS_EXCHANGE = 'search_events'
+SEARCH_EVENTS_HEARTBEAT = 15
+SEARCH_EVENTS_MAX_AGE = 60 * 10
+SEARCH_EVENTS_RETRY = 5
+SEARCH_EVENTS_QUEUE_SIZE = 100
+
+# Selenium browser of parser: 'phantomjs', 'chrome' or 'firefox'
+# (both started headless), 'fake' serves offline pages for load tests.
+# Tuning of every browser, see inapp/drivers.py for all options
+LINKEDIN_BROWSER = 'phantomjs'
+LINKEDIN_BROWSER_OPTIONS = {
+    'phantomjs': {'window_size': (1024, 768), 'load_images': False},
+    'chrome': {
+        'window_size': (1024, 768), 'load_images': False,
+        'load_fonts': False},
+    'firefox': {
+        'window_size': (1024, 768), 'load_images': False,
+        'load_fonts': False},
+    'fake': {'latency': 0.5, 'latency_jitter': 0.5, 'total_results': 250},
+}
+
+# Resource policy of parser browser. Parser reads only html of result
+# pages, so images, fonts, analytics and ads are not loaded when it is on.
+# Hosts are blocked by every browser, url regular expressions only
+# by phantomjs
+LINKEDIN_BLOCK_RESOURCES = True
+LINKEDIN_BLOCKED_HOSTS = [
+    'www.google-analytics.com',
+    'www.googletagmanager.com',
+    'googleads.g.doubleclick.net',
+    'stats.g.doubleclick.net',
+    'px.ads.linkedin.com',
+    'snap.licdn.com',
+    'platform.linkedin.com',
+    'media.licdn.com',
+]
+LINKEDIN_BLOCKED_URLS = [
+    r'\.(png|jpe?g|gif|svg|ico|webp)(\?|$)',
+    r'\.(woff2?|ttf|otf|eot)(\?|$)',
+    r'\.(mp4|webm|mp3)(\?|$)',
+    r'/li/track',
+    r'/tscp-serving/',
+]
+
+# Timeout for checking a reused browser session is still logged in
+LINKEDIN_SESSION_CHECK_TIMEOUT = 10
+
+# Max time in seconds the parser waits for user to save
+# verification code and interval of checking it in db
+VERIFICATION_CODE_MAX_WAIT = 180
+VERIFICATION_CODE_POLL_INTERVAL = 2
+
+# Idle browser sessions kept by every celery worker process
+BROWSER_POOL_MAX_IDLE = 1
+
+# Browser session is recycled after serving this number of pages
+BROWSER_SESSION_MAX_PAGES = 300
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/1.10/howto/deployment/checklist/
 
@@ -89,10 +208,25 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Parser saves pages from threads, they do not share in-memory
+        # test database
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
     }
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search_changes': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'search_changes'),
+        'TIMEOUT': None,
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
 
@@ -55,21 +55,87 @@ $(document).ready(function(){
     var page = 1;
   }
 
-  setInterval(function(){
+  // Version of shown searches and date of the last poll, unchanged
+  // searches are answered with 304, changed ones are sent alone
+  var searches_etag = null;
+  var searches_since = null;
+
+  var render_searches = function(rows){
+    var html = [];
+    html.push(thead_html);
+    for (var i=0;i<rows.length;i++){
+      html.push(get_row_html(rows[i]));
+    }
+
+    $('#allProjectsTable').html(html.join());
+  }
+
+  var update_searches = function(rows){
+    var ids = $('#allProjectsTable tr[data-search-id]').map(function(){
+      return parseInt($(this).attr('data-search-id'));
+    }).get();
+    var min_id = Math.min.apply(null, ids);
+
+    for (var i=0;i<rows.length;i++){
+      var row_el = $('#allProjectsTable tr[data-search-id="' + rows[i]['id'] + '"]');
+      if (row_el.length){
+        row_el.replaceWith(get_row_html(rows[i]));
+      } else if (!ids.length || rows[i]['id'] > min_id){
+        // New search moves rows of the page, load the whole page
+        return false;
+      }
+    }
+    return true;
+  }
+
+  var poll_searches = function(){
+    var params = {page: page};
+    if (searches_since){ params['since'] = searches_since; }
     $.ajax({
-      url: '/get_companies_list/?page=' + page,
+      url: '/get_companies_list/',
+      data: params,
       method: 'GET',
-      success: function(data){
-        var html = [];
-        html.push(thead_html);
-        for (var i=0;i<data['content'].length;i++){
-          html.push(get_row_html(data['content'][i]));
+      headers: searches_etag ? {'If-None-Match': searches_etag} : {},
+      success: function(data, text_status, xhr){
+        if (xhr.status == 304){ return; }
+
+        if (data['delta'] && !update_searches(data['content'])){
+          searches_etag = null;
+          searches_since = null;
+          poll_searches();
+          return;
         }
+        if (!data['delta']){ render_searches(data['content']); }
+
+        searches_etag = xhr.getResponseHeader('ETag');
+        searches_since = data['since'];
+      }
+    });
+  }
 
-        $('#allProjectsTable').html(html.join());
+  // Status changes are pushed by event stream, polling brings progress
+  // of pages and all changes when stream is not connected
+  var stream_open = false;
+  if (window.EventSource){
+    var search_events = new EventSource('/search_events/');
+    search_events.onopen = function(){ stream_open = true; }
+    search_events.onerror = function(){ stream_open = false; }
+    search_events.addEventListener('search', function(e){
+      if (!update_searches([JSON.parse(e.data)])){
+        searches_etag = null;
+        searches_since = null;
+        poll_searches();
       }
     });
-  }, 5000);
+  }
+
+  var schedule_poll = function(){
+    setTimeout(function(){
+      poll_searches();
+      schedule_poll();
+    }, stream_open ? 30000 : 5000);
+  }
+  schedule_poll();
 
   var thead_html = '<thead>' +
     '<tr>' +
@@ -80,6 +146,7 @@ $(document).ready(function(){
       '<th>Search type</th>' +
       '<th>Date</th>' +
       '<th>Status</th>' +
+      '<th>Progress</th>' +
       '<th>Link to search details</th>' +
       '<th>Save to CSV</th>' +
     '</tr>' +
@@ -98,17 +165,27 @@ $(document).ready(function(){
     var search_type = '';
     if(row['search_type']){ search_type = row['search_type']; }
 
+    var progress = '';
+    if(row['total_pages']){
+      progress = row['progress'] + '% of ' + row['total_pages'] + ' pages';
+      if(row['eta'] != null){ progress += ', ~' + Math.ceil(row['eta'] / 60) + ' min left'; }
+    }
+
+    var status_text = row['status_text'];
+    if(row['worker_error']){ status_text += '. Worker failed: ' + row['worker_error']; }
+
     var update_search_button = '';
     if(row['status'] == 10){ update_search_button = '<a id="update-task" class="btn" task-nmb="' + row['id'] + '">Update</a>'; }
 
-    var row_template_html = '<tr>' +
+    var row_template_html = '<tr data-search-id="' + row['id'] + '">' +
       '<td>' + row['id'] + '</td>' +
       '<td>' + search_term + '</td>' +
       '<td>' + companyId + '</td>' +
       '<td>' + search_geo + '</td>' +
       '<td>' + search_type + '</td>' +
       '<td>' + row['date_created'] + '</td>' +
-      '<td><span title="' + row['status_text'] + '" class="center glyphicon ' + row['status_icon'] + '"></span>' + update_search_button + '</td>' +
+      '<td><span title="' + status_text + '" class="center glyphicon ' + row['status_icon'] + '"></span>' + update_search_button + '</td>' +
+      '<td>' + progress + '</td>' +
       '<td><a title="Search details" target="_blank" class="center" href="' + row['search_details_url'] + '"><img width=25 src="/static/img/details.png" /></a></td>' +
       '<td><a title="Save to CSV" class="center" href="' + row['employees_to_csv'] + '"><img width=25 src="/static/img/save.png" /></a></td>' +
     '</tr>';